@@ -0,0 +1,135 @@
+"""Benchmark of the render / accumulate / save pipeline without Blender
+
+Runs eevee_motion_blur.py against the fake bpy in fake_bpy.py and times each
+stage on its own, across resolutions, sample counts and object counts:
+
+    readback      Viewer Node pixels to numpy (renderToArray_2, render is a no-op)
+    accumulate    one subframe into mbAccumulator
+    finish        average and gamma of the sum
+    writeback     finished buffer into the temp image with foreach_set
+    save          PNG encoding with writePNG
+    analysis      adaptive motion analysis (getMaxDelta)
+    frame         a whole renderMBx1fr call, encoding included
+
+Results are printed as JSON, to compare addon versions on CPU-only machines:
+
+    python benchmarks/bench_pipeline.py --resolutions 1920x1080,3840x2160 \\
+        --samples 8,32 --objects 100,2000 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.dirname(HERE))
+
+import fake_bpy
+bpy = fake_bpy.install()
+import eevee_motion_blur as emb
+
+
+def timeit(function, repeat):
+    """Best time of repeat runs, in seconds"""
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return (best)
+
+
+def bench_pixels(width, height, samples, repeat, outdir):
+    """Stages that only depend on the frame size"""
+    scene = fake_bpy.setup_scene(emb, width, height, verbosity='QUIET')
+    size = width * height * 4
+    readback = np.empty(size, dtype=np.float32)
+    results = {}
+
+    results['readback'] = timeit(lambda: emb.renderToArray_2(1, 0.0, readback), repeat)
+
+    def accumulate():
+        accumulator = emb.mbAccumulator(size, width=width)
+        for i in range(samples):
+            accumulator.add(readback)
+        return (accumulator)
+    results['accumulate'] = timeit(accumulate, repeat) / samples
+
+    results['finish'] = timeit(lambda: accumulate().finish(scene.eeveeMotionBlur_vars.gamma), repeat) \
+        - results['accumulate'] * samples
+
+    pixels = accumulate().finish(scene.eeveeMotionBlur_vars.gamma)
+    results['writeback'] = timeit(lambda: emb.getTempImage(width, height).pixels.foreach_set(pixels), repeat)
+
+    path = os.path.join(outdir, "bench.png")
+    results['save'] = timeit(lambda: emb.writePNG(path, pixels, width, height), repeat)
+
+    scene.render.filepath = os.path.join(outdir, "frame_")
+    scene.eeveeMotionBlur_vars.use_adaptive = False
+    scene.eevee.motion_blur_samples = samples
+    writer = emb.mbAsyncWriter()
+    results['frame'] = timeit(lambda: emb.renderMBx1fr(1, scene.eevee.motion_blur_shutter, samples,
+        bpy.context, writer=writer), repeat)
+    writer.close()
+    return (results)
+
+
+def bench_analysis(width, height, objects, repeat, mode):
+    """Adaptive motion analysis for a number of objects"""
+    fake_bpy.setup_scene(emb, width, height, objects=objects, analysis_mode=mode, verbosity='QUIET')
+    return (timeit(lambda: emb.getMaxDelta(bpy.context, 1), repeat))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--resolutions", default="1280x720,1920x1080",
+        help="comma separated WIDTHxHEIGHT list")
+    parser.add_argument("--samples", default="8", help="comma separated subframe counts")
+    parser.add_argument("--objects", default="100,1000", help="comma separated object counts")
+    parser.add_argument("--modes", default="BOUNDS,SUBFRAMES", help="motion analysis modes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measure, the best is kept")
+    parser.add_argument("--output", default=None, help="JSON file, stdout if not given")
+    args = parser.parse_args(argv)
+
+    resolutions = [tuple(int(v) for v in res.split("x")) for res in args.resolutions.split(",")]
+    samples_list = [int(v) for v in args.samples.split(",")]
+    objects_list = [int(v) for v in args.objects.split(",")]
+
+    results = []
+    outdir = tempfile.mkdtemp(prefix="emb_bench_")
+    for width, height in resolutions:
+        for samples in samples_list:
+            stages = bench_pixels(width, height, samples, args.repeat, outdir)
+            for stage, seconds in stages.items():
+                results.append({'stage' : stage, 'width' : width, 'height' : height,
+                    'samples' : samples, 'seconds' : seconds})
+        for objects in objects_list:
+            for mode in args.modes.split(","):
+                seconds = bench_analysis(width, height, objects, args.repeat, mode)
+                results.append({'stage' : 'analysis', 'mode' : mode, 'width' : width,
+                    'height' : height, 'objects' : objects, 'seconds' : seconds})
+
+    report = {
+        'addon_version' : ".".join(str(v) for v in emb.bl_info['version']),
+        'python' : platform.python_version(),
+        'numpy' : np.__version__,
+        'machine' : platform.machine(),
+        'results' : results
+    }
+    text = json.dumps(report, indent=1)
+    if (args.output):
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print (text)
+    return (0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
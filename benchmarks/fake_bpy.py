@@ -0,0 +1,336 @@
+"""Lightweight stand-in for bpy, mathutils and bpy_extras
+
+Just enough of the Blender API for eevee_motion_blur.py to be imported and
+its render / accumulate / save pipeline to run outside Blender. Rendering is
+a no-op that fills the Viewer Node with synthetic pixels, objects move along
+simple animated paths, saving writes nothing.
+
+    import fake_bpy
+    fake_bpy.install()
+    import eevee_motion_blur as emb
+    scene = fake_bpy.setup_scene(emb, width=1920, height=1080, objects=200)
+"""
+import math
+import sys
+import types
+
+import numpy as np
+
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------- mathutils ------------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class Vector(tuple):
+    def __new__(cls, values):
+        return (tuple.__new__(cls, (float(v) for v in values)))
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    z = property(lambda self: self[2])
+
+    def __truediv__(self, value):
+        return (Vector(v / value for v in self))
+
+    def __neg__(self):
+        return (Vector(-v for v in self))
+
+
+class Matrix():
+    def __init__(self, rows=None):
+        self._m = np.identity(4) if rows is None else np.array(rows, dtype=np.float64)
+
+    def __array__(self, dtype=None, copy=None):
+        return (self._m.astype(dtype) if dtype else self._m.copy())
+
+    def __iter__(self):
+        return (iter(Vector(row) for row in self._m))
+
+    def __matmul__(self, other):
+        if (isinstance(other, Matrix)):
+            return (Matrix(self._m @ other._m))
+        co = self._m @ np.append(np.asarray(other, dtype=np.float64)[:3], 1.0)
+        return (Vector(co[:3]))
+
+    def normalized(self):
+        m = self._m.copy()
+        m[:3, :3] /= np.linalg.norm(m[:3, :3], axis=0)
+        return (Matrix(m))
+
+    def inverted(self):
+        return (Matrix(np.linalg.inv(self._m)))
+
+    @staticmethod
+    def Translation(co):
+        m = np.identity(4)
+        m[:3, 3] = co
+        return (Matrix(m))
+
+
+def world_to_camera_view(scene, obj, coord):
+    """Same maths as bpy_extras.object_utils.world_to_camera_view"""
+    co_local = obj.matrix_world.normalized().inverted() @ coord
+    z = -co_local.z
+    camera = obj.data
+    frame = [v for v in camera.view_frame(scene=scene)[:3]]
+    if (camera.type != 'ORTHO'):
+        if (z == 0.0):
+            return (Vector((0.5, 0.5, 0.0)))
+        frame = [-(v / (v.z / z)) for v in frame]
+    min_x, max_x = frame[2].x, frame[1].x
+    min_y, max_y = frame[1].y, frame[0].y
+    x = (co_local.x - min_x) / (max_x - min_x)
+    y = (co_local.y - min_y) / (max_y - min_y)
+    return (Vector((x, y, z)))
+
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# --------------------------------- props --------------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class _Property():
+    """What bpy.props.*Property returns here: it only remembers its default"""
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        self.kwargs = kwargs
+
+    @property
+    def default(self):
+        if ('default' in self.kwargs):
+            return (self.kwargs['default'])
+        return ({'Float' : 0.0, 'Int' : 0, 'Bool' : False, 'String' : ""}.get(self.kind))
+
+
+def _prop(kind):
+    return (lambda **kwargs: _Property(kind, **kwargs))
+
+
+def property_defaults(cls):
+    """Namespace with the defaults of a PropertyGroup's annotations"""
+    return (types.SimpleNamespace(**{name : prop.default
+        for name, prop in getattr(cls, '__annotations__', {}).items()}))
+
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------------- data --------------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class Pixels():
+    """Float pixel array with bulk foreach_get / foreach_set like bpy's"""
+    def __init__(self, size):
+        self.data = np.zeros(size, dtype=np.float32)
+
+    def __len__(self):
+        return (len(self.data))
+
+    def __getitem__(self, index):
+        # slicing goes through python floats, like the real thing
+        return (self.data[index].tolist())
+
+    def foreach_get(self, buffer):
+        buffer[...] = self.data
+
+    def foreach_set(self, buffer):
+        self.data[...] = buffer
+
+
+class Image():
+    def __init__(self, name, width, height):
+        self.name = name
+        self.size = (width, height)
+        self.pixels = Pixels(width * height * 4)
+        self.alpha_mode = 'STRAIGHT'
+        self.file_format = 'PNG'
+        self.filepath_raw = ""
+        self.saved = 0
+
+    def update(self):
+        pass
+
+    def save_render(self, filepath, scene=None):
+        self.saved += 1
+
+
+class Images(dict):
+    def new(self, name, width, height, alpha=True, float_buffer=False):
+        self[name] = Image(name, width, height)
+        return (self[name])
+
+    def remove(self, image):
+        del self[image.name]
+
+
+class Node():
+    def __init__(self, type_, name):
+        self.type = type_
+        self.name = name
+
+
+class ID():
+    """What every datablock has"""
+    bl_rna = None
+    animation_data = None
+
+    def __init__(self, name):
+        self.name = name
+        self.bl_rna = types.SimpleNamespace(identifier=type(self).__name__)
+
+    def as_pointer(self):
+        return (id(self))
+
+
+class Mesh(ID):
+    def __init__(self, name, vertices):
+        ID.__init__(self, name)
+        self.vertices = [None] * vertices
+        self.shape_keys = None
+
+
+class Camera(ID):
+    """Perspective camera data, 50mm on a 36mm sensor"""
+    type = 'PERSP'
+    lens = 50.0
+    ortho_scale = 6.0
+    sensor_fit = 'AUTO'
+    sensor_width = 36.0
+    sensor_height = 24.0
+    shift_x = 0.0
+    shift_y = 0.0
+    clip_start = 0.1
+    clip_end = 100.0
+
+    def view_frame(self, scene=None):
+        aspect = scene.render.resolution_y / scene.render.resolution_x
+        half_x = 0.5 * 36.0 / 50.0
+        half_y = half_x * aspect
+        return ([Vector((half_x, half_y, -1.0)), Vector((half_x, -half_y, -1.0)),
+            Vector((-half_x, -half_y, -1.0)), Vector((-half_x, half_y, -1.0))])
+
+
+class Object(ID):
+    """Cube that moves along a circle, its matrix follows the scene time"""
+    def __init__(self, name, position, speed, radius=0.5, type_='MESH'):
+        ID.__init__(self, name)
+        self.type = type_
+        self.hide_render = False
+        self.is_holdout = False
+        self.parent = None
+        self.modifiers = []
+        self.constraints = []
+        self.data = Mesh(name, 8)
+        self.bound_box = [[x, y, z] for x in (-radius, radius) for y in (-radius, radius) for z in (-radius, radius)]
+        self._position = np.asarray(position, dtype=np.float64)
+        self._speed = speed
+        self.matrix_basis = Matrix()
+        self.matrix_world = Matrix()
+        self.evaluate(1.0)
+
+    def evaluate(self, time):
+        angle = time * self._speed
+        offset = np.array([math.cos(angle), math.sin(angle), 0.0])
+        self.matrix_world = Matrix.Translation(self._position + offset)
+
+
+class Scene():
+    def __init__(self, width, height, emb_vars, objects):
+        self.name = "Scene"
+        self.frame_current = 1
+        self.frame_start = 1
+        self.frame_end = 1
+        self.frame_step = 1
+        self.use_nodes = True
+        self.node_tree = types.SimpleNamespace(nodes=[Node('VIEWER', "Viewer")], links=[])
+        self.render = types.SimpleNamespace(
+            resolution_x=width, resolution_y=height, resolution_percentage=100,
+            filepath="/tmp/emb_bench/", file_extension=".png",
+            use_border=False, use_crop_to_border=False, film_transparent=False,
+            border_min_x=0.0, border_min_y=0.0, border_max_x=1.0, border_max_y=1.0,
+            image_settings=types.SimpleNamespace(file_format='PNG', color_mode='RGBA',
+                color_depth='8', compression=15))
+        self.view_settings = types.SimpleNamespace(view_transform='Standard', look='None',
+            exposure=0.0, gamma=1.0, use_curve_mapping=False)
+        self.eevee = types.SimpleNamespace(use_motion_blur=False, motion_blur_samples=8,
+            motion_blur_shutter=0.5, taa_render_samples=64)
+        self.eeveeMotionBlur_vars = emb_vars
+        self.camera = Object("Camera", (0.0, 0.0, 20.0), 0.0, type_='CAMERA')
+        self.camera.data = Camera("Camera")
+        # still, 20 units back looking down -z
+        self.camera.evaluate = lambda time: None
+        self.camera.matrix_world = self.camera.matrix_basis = Matrix.Translation((0.0, 0.0, 20.0))
+        self.objects = list(objects)
+        self.renders = 0
+
+    def frame_set(self, frame, subframe=0.0):
+        self.frame_current = int(frame)
+        for obj in self.objects:
+            obj.evaluate(frame + subframe)
+
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------- install --------------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return (module)
+
+
+def install():
+    """Puts the fake modules in sys.modules, call before importing the addon"""
+    if (isinstance(sys.modules.get('bpy'), types.ModuleType) and getattr(sys.modules['bpy'], '_fake', False)):
+        return (sys.modules['bpy'])
+
+    props = _module('bpy.props', **{kind + 'Property' : _prop(kind)
+        for kind in ('Float', 'Int', 'Bool', 'String', 'Enum', 'Pointer', 'FloatVector')})
+    bpy_types = _module('bpy.types', **{name : type(name, (), {})
+        for name in ('Operator', 'Panel', 'PropertyGroup', 'Scene')})
+    utils = _module('bpy.utils', register_class=lambda cls: None, unregister_class=lambda cls: None)
+
+    def render(**kwargs):
+        scene = bpy.context.scene
+        scene.renders += 1
+        # sized like blender sizes renders
+        render = scene.render
+        size = (render.resolution_x * render.resolution_percentage // 100, 
+            render.resolution_y * render.resolution_percentage // 100)
+        viewer = bpy.data.images['Viewer Node']
+        if (tuple(viewer.size) != size):
+            viewer = bpy.data.images.new('Viewer Node', *size)
+        # something cheap that changes with time
+        viewer.pixels.data.fill(0.5 + 0.001 * (scene.renders % 100))
+        if (render.use_border and not render.use_crop_to_border):
+            # the film stays empty around the border
+            width, height = viewer.size
+            inside = np.zeros((height, width), dtype=bool)
+            inside[int(render.border_min_y * height):int(np.ceil(render.border_max_y * height)), 
+                int(render.border_min_x * width):int(np.ceil(render.border_max_x * width))] = True
+            viewer.pixels.data.reshape(height, width, 4)[~inside] = 0.0
+
+    bpy = _module('bpy', props=props, types=bpy_types, utils=utils, _fake=True,
+        app=types.SimpleNamespace(binary_path="blender", version=(2, 93, 0)),
+        path=types.SimpleNamespace(abspath=lambda path: path),
+        context=types.SimpleNamespace(scene=None, window=None),
+        data=types.SimpleNamespace(images=Images(), node_groups={}),
+        ops=types.SimpleNamespace(render=types.SimpleNamespace(render=render)))
+
+    _module('mathutils', Vector=Vector, Matrix=Matrix, __all__=['Vector', 'Matrix'])
+    object_utils = _module('bpy_extras.object_utils', world_to_camera_view=world_to_camera_view)
+    _module('bpy_extras', object_utils=object_utils)
+    return (bpy)
+
+
+def setup_scene(emb, width=1920, height=1080, objects=0, speed=1.0, **settings):
+    """New fake scene with the addon's default settings and objects spread
+    in front of the camera. settings override eeveeMotionBlur_vars.
+    """
+    bpy = sys.modules['bpy']
+    emb_vars = property_defaults(emb.eeveeMotionBlur_variables)
+    for name, value in settings.items():
+        setattr(emb_vars, name, value)
+
+    rng = np.random.default_rng(0)
+    obs = [Object("Cube.%04d" % n, rng.uniform((-6, -4, -5), (6, 4, 5)), speed)
+        for n in range(objects)]
+    scene = Scene(width, height, emb_vars, obs)
+    bpy.context.scene = scene
+    bpy.data.images.clear()
+    bpy.data.images.new('Viewer Node', width, height)
+    return (scene)
@@ -14,14 +14,38 @@ bl_info = {
 import bpy
 from datetime import datetime
 import numpy as np
+import hashlib
+import json
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import glob
+import traceback
+from collections import deque, OrderedDict
+import queue
+import threading
+import struct
+import zlib
+import re
 import math
 from mathutils import *; from math import *
 
-from bpy_extras.object_utils import world_to_camera_view
-import array as arr
 from bpy.props import FloatProperty
 from bpy.props import IntProperty
 from bpy.props import BoolProperty
+from bpy.props import StringProperty
+from bpy.props import EnumProperty
+
+# optional, reads and writes the multilayer EXR of the render passes
+try:
+    import OpenEXR
+    import Imath
+except ImportError:
+    OpenEXR = None
 
 
 # #################################### ###################################
@@ -89,61 +113,980 @@ def mbCompositorSetup():
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 # -----------------------------render to array 2--------------------------
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-def renderToArray_2(frame, subfr):
-    """Takes the output of a Viewer node and dumps it to a numpy array"""
-    # move playhead
-    bpy.context.scene.frame_set(frame , subframe=subfr)
-        
+def renderToArray_2(frame, subfr, buffer=None, metrics=None):
+    """Takes the output of a Viewer node and dumps it to a numpy array
+
+    If a float32 buffer is given the pixels are copied into it in bulk,
+    otherwise a new one is allocated. The buffer is returned either way.
+    An mbMetrics gets the time of each step.
+    """
+    start = time.perf_counter()
+    # move playhead, subframes may run past the next frame
+    frame += floor(subfr)
+    bpy.context.scene.frame_set(frame , subframe=subfr - floor(subfr))
+    if (metrics is not None):
+        start = metrics.add('set_frame', start)
+
     # render
     bpy.ops.render.render()
-    
+    if (metrics is not None):
+        start = metrics.add('render', start)
+
     # collect image
     pixels = bpy.data.images['Viewer Node'].pixels
     
-    # buffer to numpy array for faster manipulation
-    return ( np.array(pixels[:]) )
+    # reallocate only if the viewer size doesn't match the buffer
+    if (buffer is None or buffer.size != len(pixels)):
+        buffer = np.empty(len(pixels), dtype=np.float32)
+    
+    # bulk copy straight into the numpy buffer, no python list in between
+    pixels.foreach_get(buffer)
+    if (metrics is not None):
+        metrics.add('readback', start)
+    return (buffer)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- renderRawToArray --------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def renderRawToArray(frame, subfr, buffer, metrics):
+    """Like renderToArray_2 but without the compositor or the Viewer
+
+    The render is written as an EXR to the scratch output (see
+    setScratchOutput) with compositing off, and loaded back as is.
+    """
+    scene = bpy.context.scene
+    start = time.perf_counter()
+    scene.frame_set(frame + floor(subfr), subframe=subfr - floor(subfr))
+    start = metrics.add('set_frame', start)
+    bpy.ops.render.render(write_still=True)
+    start = metrics.add('render', start)
+
+    path = scene.render.frame_path(frame=scene.frame_current)
+    image = bpy.data.images.load(path)
+    try:
+        pixels = image.pixels
+        if (buffer is None or buffer.size != len(pixels)):
+            buffer = np.empty(len(pixels), dtype=np.float32)
+        pixels.foreach_get(buffer)
+    finally:
+        bpy.data.images.remove(image)
+        os.remove(path)
+    metrics.add('readback', start)
+    return (buffer)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ getTempImage ----------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getTempImage(width, height):
+    """Returns the temp image used to save frames, reusing it if it fits"""
+    image_name = '__motion_blur_temp__'
+    if image_name in bpy.data.images:
+        image_object = bpy.data.images[image_name]
+        # same size: keep the datablock, pixels get overwritten anyway
+        if (tuple(image_object.size) == (width, height)):
+            return (image_object)
+        bpy.data.images.remove(image_object)
+    image_object = bpy.data.images.new(name=image_name, alpha=True, width=width, height=height)
+    # image_object.use_alpha = True
+    image_object.alpha_mode = 'STRAIGHT'
+    return (image_object)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ getOutputPath ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getOutputPath(scene, frame):
+    """Absolute path of the image of a frame"""
+    # render passes always go to a multilayer EXR
+    extension = ".exr" if scene.eeveeMotionBlur_vars.use_multilayer else scene.render.file_extension
+    return (bpy.path.abspath(scene.render.filepath) + "%04d" % frame + extension)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- getCheckpointPath -------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getCheckpointPath(scene, frame):
+    """Where the partial sum of a frame is checkpointed"""
+    return (bpy.path.abspath(scene.render.filepath) + "%04d" % frame + ".emb_partial.npz")
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------- mbJournal ------------------------------
+# ––––––––––––––– status of every frame of a sequence on disk ––––––––––––
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class mbJournal():
+    """Keeps a JSON file next to the output with the status of each frame
+
+    Every frame records its status, samples, render time, output path and
+    the sha1 of the saved file, so an interrupted sequence can skip the
+    frames that are already on disk and valid.
+    """
+    def __init__(self, scene):
+        self.path = bpy.path.abspath(scene.render.filepath) + "emb_journal.json"
+        self.frames = {}
+        try:
+            with open(self.path) as f:
+                self.frames = {int(frame) : entry for frame, entry in json.load(f)['frames'].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'frames' : self.frames}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def mark(self, frame, status, **entry):
+        """Records the status of a frame, and its checksum once it is done"""
+        entry = dict(self.frames.get(frame, {}), status=status, **entry)
+        if (status == 'done'):
+            entry['sha1'] = fileChecksum(entry.get('path'))
+            if (entry['sha1'] is None):
+                entry['status'] = 'failed'
+                entry['error'] = "output file missing"
+        self.frames[frame] = entry
+        self.save()
+
+    def isDone(self, frame):
+        """True if the frame finished and its file is still the same"""
+        entry = self.frames.get(frame)
+        if (not entry or entry.get('status') != 'done'):
+            return (False)
+        return (fileChecksum(entry.get('path')) == entry.get('sha1'))
+
+def fileChecksum(path):
+    if (not path or not os.path.exists(path)):
+        return (None)
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return (h.hexdigest())
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# -------------------------------- logging -------------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+LOG_QUIET = 0
+LOG_NORMAL = 1
+LOG_VERBOSE = 2
+LOG_LEVELS = {'QUIET' : LOG_QUIET, 'NORMAL' : LOG_NORMAL, 'VERBOSE' : LOG_VERBOSE}
+
+def embLog(scene, level, message, *args):
+    """Prints message % args if the verbosity of the scene allows it
+
+    Nothing is formatted when it doesn't, so pass the values as args
+    instead of building the string. LOG_QUIET messages always print.
+    """
+    if (level <= LOG_LEVELS.get(scene.eeveeMotionBlur_vars.verbosity, LOG_NORMAL)):
+        print (message % args if args else message)
+
+# numbers of the last frame and sequence rendered, shown in the panel
+lastMetrics = {}
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# -------------------------------- mbMetrics -----------------------------
+# ––––––––––––––––––––––– timings of every render stage ––––––––––––––––––
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class mbMetrics():
+    """Times the stages of the frames of a render and adds them up
+
+    add(stage, start) takes a time.perf_counter() value and returns a new
+    one, so hot loops only do arithmetic. Every frame is a record with the
+    seconds spent in each stage, the time of every subframe, the samples
+    and the peak buffer memory. With the metrics log enabled the records
+    are appended as JSON lines to emb_metrics.jsonl next to the output,
+    followed by a summary of the sequence.
+    """
+    STAGES = ('set_frame', 'render', 'readback', 'reproject', 'accumulate', 'cache', 'encode', 'save')
+
+    def __init__(self, scene):
+        emb_vars = scene.eeveeMotionBlur_vars
+        self.level = LOG_LEVELS.get(emb_vars.verbosity, LOG_NORMAL)
+        self.path = None
+        if (emb_vars.use_metrics_log):
+            self.path = bpy.path.abspath(scene.render.filepath) + "emb_metrics.jsonl"
+        self.totals = dict.fromkeys(self.STAGES, 0.0)
+        self.frames = 0
+        self.samples = 0
+        self.seconds = 0.0
+        self.peak_memory = 0
+        self.record = None
+        self._start = None
+
+    def log(self, level, message, *args):
+        """Like embLog, with the verbosity read once"""
+        if (level <= self.level):
+            print (message % args if args else message)
+
+    def begin(self, frame):
+        """Starts the record of a frame"""
+        self.record = {'type' : 'frame', 'frame' : frame,
+            'stages' : dict.fromkeys(self.STAGES, 0.0), 'subframes' : [], 'peak_memory' : 0}
+        self._start = time.perf_counter()
+
+    def add(self, stage, start):
+        """Adds the time since start to a stage of the frame, returns now"""
+        now = time.perf_counter()
+        self.record['stages'][stage] += now - start
+        return (now)
+
+    def subframe(self, subfr, start):
+        """Records how long a whole subframe took"""
+        self.record['subframes'].append((subfr, time.perf_counter() - start))
+
+    def memory(self, nbytes):
+        """Buffer memory in use right now, the peak is kept"""
+        self.record['peak_memory'] = max(self.record['peak_memory'], int(nbytes))
+
+    def end(self, **entry):
+        """Closes the frame record, entry adds to it. Returns the record"""
+        record = self.record
+        record.update(entry)
+        record['seconds'] = time.perf_counter() - self._start
+        self.record = None
+        self.merge(record)
+        self.write(record)
+        lastMetrics['frame'] = record
+        return (record)
+
+    def merge(self, record):
+        """Adds a frame record to the totals, also one from a worker"""
+        for stage, seconds in record.get('stages', {}).items():
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+        self.frames += 1
+        self.samples += record.get('samples') or 0
+        self.seconds += record.get('seconds') or 0.0
+        self.peak_memory = max(self.peak_memory, record.get('peak_memory', 0))
+
+    def summary(self, **entry):
+        """Totals and per frame means of the sequence, logged and returned"""
+        frames = max(self.frames, 1)
+        record = dict(entry, type='sequence', frames=self.frames, samples=self.samples,
+            seconds=self.seconds, peak_memory=self.peak_memory, stages=dict(self.totals),
+            mean_stages={stage : total / frames for stage, total in self.totals.items()})
+        self.write(record)
+        lastMetrics['sequence'] = record
+        if (self.level >= LOG_NORMAL):
+            print ("frames " + str(self.frames) + ", subframes " + str(self.samples) +
+                ", peak buffer memory " + str(round(self.peak_memory / 2**20)) + " MB")
+            for stage in self.STAGES:
+                print ("\t" + stage + ": " + str(round(record['mean_stages'][stage], 3)) + "s per frame")
+        return (record)
+
+    def write(self, record):
+        if (self.path is None):
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ canSaveAsync ----------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def canSaveAsync(scene):
+    """True if the frame can be encoded without blender
+
+    Only PNG is encoded outside blender, and only when the color management
+    leaves the pixels as they are (Standard view, no look, no exposure or
+    gamma, no curves), otherwise save_render is used. Multilayer passes
+    are always written outside blender.
+    """
+    if (scene.eeveeMotionBlur_vars.use_multilayer):
+        # passes are written with OpenEXR, linear, no color management
+        return (OpenEXR is not None)
+    settings = scene.render.image_settings
+    view = scene.view_settings
+    return (settings.file_format == 'PNG' and settings.color_mode in ('RGB', 'RGBA') and 
+        view.view_transform == 'Standard' and view.look == 'None' and 
+        view.exposure == 0.0 and view.gamma == 1.0 and not view.use_curve_mapping)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# -------------------------------- writePNG ------------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def writePNG(path, pixels, width, height, alpha=True, bitdepth=8, compression=15):
+    """Writes a flat RGBA float buffer (bottom row first) as a PNG file
+
+    Pure numpy + zlib, zlib lets go of the GIL so this runs well in threads.
+    """
+    rgba = pixels.reshape(height, width, 4)[::-1]
+    if (not alpha):
+        rgba = rgba[..., :3]
+    channels = rgba.shape[-1]
+    
+    # quantize, PNG is big endian
+    top = 255 if bitdepth == 8 else 65535
+    values = np.clip(rgba, 0.0, 1.0) * top
+    values += 0.5
+    values = values.astype(np.uint8 if bitdepth == 8 else '>u2')
+    
+    # every row starts with its filter type, 0 = none
+    rows = values.reshape(height, -1).view(np.uint8)
+    raw = np.zeros((height, rows.shape[1] + 1), dtype=np.uint8)
+    raw[:, 1:] = rows
+    
+    def chunk(tag, data):
+        body = tag + data
+        return (struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body) & 0xffffffff))
+    
+    color_type = 6 if channels == 4 else 2
+    header = struct.pack(">IIBBBBB", width, height, bitdepth, color_type, 0, 0, 0)
+    level = min(9, max(0, round(compression * 9 / 100)))
+    data = zlib.compress(raw.tobytes(), level)
+    
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", data) + chunk(b"IEND", b""))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ mbAsyncWriter ---------------------------
+# ––––––––––––––––––––––––– saves frames in threads ––––––––––––––––––––––
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class mbAsyncWriter():
+    """Encodes and writes finished frames in background threads
+
+    put() blocks while the queue is full, so at most threads + queue_size
+    frames are held in memory. drain() waits until everything is written.
+    """
+    def __init__(self, threads=2, queue_size=2):
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self.errors = []
+        self.written = []
+        # time spent encoding and writing, all threads together
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, daemon=True) for i in range(max(1, threads))]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, path, pixels, width, height, image_settings):
+        """Queues a finished buffer, the buffer must not be reused afterwards"""
+        # copy the settings, bpy data can't be read from other threads
+        options = {'alpha' : image_settings.color_mode == 'RGBA', 
+            'bitdepth' : int(image_settings.color_depth), 
+            'compression' : image_settings.compression}
+        self.submit(writePNG, path, pixels, width, height, **options)
+
+    def submit(self, function, path, *args, **kwargs):
+        """Queues any function that writes path, called as function(path, *args, **kwargs)"""
+        self._queue.put((function, path, args, kwargs))
+
+    def _work(self):
+        while (True):
+            item = self._queue.get()
+            if (item is None):
+                self._queue.task_done()
+                return
+            function, path, args, kwargs = item
+            start = time.perf_counter()
+            try:
+                function(path, *args, **kwargs)
+                with self._lock:
+                    self.written.append(path)
+                    self.seconds += time.perf_counter() - start
+            except Exception as e:
+                self.errors.append((path, e))
+            finally:
+                self._queue.task_done()
+
+    def takeWritten(self):
+        """Paths written since the last call"""
+        with self._lock:
+            written, self.written = self.written, []
+        return (written)
+
+    def drain(self):
+        """Waits for the queued frames to be written, returns the errors"""
+        self._queue.join()
+        return (self.errors)
+
+    def close(self):
+        """Drains the queue and stops the threads"""
+        self.drain()
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        return (self.errors)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ mbAccumulator ---------------------------
+# –––––––––––– running sum of subframes, compensated, in place –––––––––––
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class mbAccumulator():
+    """Averages subframes into a single buffer without temporaries
+
+    Uses Kahan summation so many samples don't drift in float32. The
+    subframe buffer passed to add() is used as scratch and gets clobbered.
+    With width set, subframes can be added to a single region only, the
+    rest of the frame then keeps the average of the full frames. Weights
+    can be a number or one per row (rolling shutter).
+    
+    backend 'DISK' keeps the sums in memory mapped files in scratch and
+    works through them in bands of rows, so only a band at a time has to
+    be resident.
+    """
+    def __init__(self, size, double=False, width=None, backend='RAM', scratch=None):
+        self.dtype = np.float64 if double else np.float32
+        self.width = width or size // 4
+        self.height = size // (self.width * 4)
+        self.backend = backend
+        self._files = []
+        self.sum = self._alloc(size, self.dtype, scratch)
+        # running compensation, stored negated so no extra scratch is needed
+        self._comp = self._alloc(size, self.dtype, scratch)
+        # total weight of every row
+        self.weight = np.zeros(self.height)
+        self.count = 0
+        # region (x0, y0, x1, y1) in pixels and weight added only there
+        self.region = None
+        self.region_weight = np.zeros(self.height)
+        # rows per band, about 64 MB of sum at a time on disk
+        row_bytes = self.width * 4 * np.dtype(self.dtype).itemsize
+        self.band_rows = max(1, (64 << 20) // row_bytes) if backend == 'DISK' else self.height
+
+    @property
+    def nbytes(self):
+        """Size of the buffers, mapped ones included"""
+        return (sum(b.nbytes for b in (self.sum, self._comp) if b is not None))
+
+    def _alloc(self, shape, dtype, scratch):
+        if (self.backend != 'DISK'):
+            return (np.zeros(shape, dtype=dtype))
+        f = tempfile.NamedTemporaryFile(prefix="emb_acc_", suffix=".raw", dir=scratch or None, delete=False)
+        f.close()
+        buffer = np.memmap(f.name, dtype=dtype, mode='w+', shape=shape)
+        try:
+            # the mapping lives on without the name, nothing is left behind
+            os.unlink(f.name)
+        except OSError:
+            # not on windows, removed in close()
+            self._files.append(f.name)
+        return (buffer)
+
+    def _bands(self, region=None):
+        """(rows, columns) slices covering the frame or a region, a band at a time"""
+        x0, y0, x1, y1 = region if region is not None else (0, 0, self.width, self.height)
+        for row in range(y0, y1, self.band_rows):
+            yield (slice(row, min(row + self.band_rows, y1)), slice(x0, x1))
+
+    def _view(self, buffer, band):
+        """View of a band of a flat RGBA buffer"""
+        rows, cols = band
+        return (buffer.reshape(self.height, self.width, 4)[rows, cols])
+
+    def add(self, buffer, weight=1.0, region=None):
+        """Adds one subframe in place, or only its region"""
+        if (region is not None):
+            if (self.region is not None and tuple(region) != self.region):
+                raise ValueError("all subframes must use the same region")
+            self.region = tuple(region)
+        
+        per_row = np.ndim(weight) > 0
+        for band in self._bands(region):
+            x, total, comp = (self._view(b, band) for b in (buffer, self.sum, self._comp))
+            if (per_row):
+                np.multiply(x, weight[band[0], None, None], out=x, casting='unsafe')
+            elif (weight != 1.0):
+                np.multiply(x, weight, out=x)
+            # y = x - c
+            np.add(x, comp, out=x)
+            # t = sum + y, c = (t - sum) - y  (kept as -c)
+            comp[...] = total
+            np.add(total, x, out=total)
+            np.subtract(comp, total, out=comp)
+            np.add(comp, x, out=comp)
+        
+        if (region is not None):
+            self.region_weight[region[1]:region[3]] += (weight[region[1]:region[3]] if per_row else weight)
+        else:
+            self.weight += weight
+        self.count += 1
+
+    def save(self, path, meta):
+        """Writes the running sum to disk so the frame can be resumed"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, 'wb') as f:
+            np.savez(f, sum=self.sum, comp=self._comp, weight=self.weight, 
+                region_weight=self.region_weight, count=self.count, 
+                meta=np.array(json.dumps(meta)))
+        # never leave a half written checkpoint
+        os.replace(tmp, path)
+
+    def load(self, path, meta):
+        """Loads a checkpoint written by save() if it matches meta
+
+        Returns the saved meta, or None if there is no usable checkpoint.
+        """
+        if (not os.path.exists(path)):
+            return (None)
+        try:
+            with np.load(path) as data:
+                saved = json.loads(str(data['meta']))
+                if (any(saved.get(key) != value for key, value in meta.items()) or 
+                    data['sum'].shape != self.sum.shape or data['sum'].dtype != self.dtype):
+                    return (None)
+                self.sum[...] = data['sum']
+                self._comp[...] = data['comp']
+                self.weight[...] = data['weight']
+                self.region_weight[...] = data['region_weight']
+                self.count = int(data['count'])
+        except (OSError, ValueError, KeyError):
+            return (None)
+        if (saved.get('region') is not None):
+            saved['region'] = self.region = tuple(saved['region'])
+        return (saved)
+
+    def finish(self, gamma=1.0):
+        """Divides by the total weight and applies gamma, returns the sum buffer"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(self.weight > 0, 1.0 / self.weight, 0.0)
+            region_scale = np.where(self.weight + self.region_weight > 0, 
+                self.weight / (self.weight + self.region_weight), 0.0)
+        for band in self._bands():
+            total = self._view(self.sum, band)
+            # fold the last correction back in
+            np.add(total, self._view(self._comp, band), out=total)
+            np.multiply(total, scale[band[0], None, None], out=total, casting='unsafe')
+        if (self.region is not None):
+            # the region also has the subframes that were rendered only there
+            for band in self._bands(self.region):
+                total = self._view(self.sum, band)
+                np.multiply(total, region_scale[band[0], None, None], out=total, casting='unsafe')
+        if (gamma != 1.0):
+            for band in self._bands():
+                total = self._view(self.sum, band)
+                np.power(total, gamma, out=total)
+        # drop the compensation buffer
+        self._comp = None
+        return (self.sum)
+
+    def close(self):
+        """Frees the scratch files that could not be removed while mapped"""
+        self.sum = self._comp = None
+        for name in self._files:
+            try:
+                os.remove(name)
+            except OSError:
+                pass
+        self._files = []
+
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# --------------------------- mbVarianceTracker --------------------------
+# –––––––– running per pixel mean and variance of the luminance ––––––––––
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class mbVarianceTracker():
+    """Estimates how noisy the average of the subframes still is
+
+    Keeps Welford's running mean and squared deviations of the luminance of
+    every pixel, and measures the standard error of the mean per tile.
+    """
+    def __init__(self, width, height, tile=32):
+        self.width = width
+        self.height = height
+        self.mean = np.zeros((height, width), dtype=np.float32)
+        self._m2 = np.zeros((height, width), dtype=np.float32)
+        self.count = 0
+        self._rows = np.arange(0, height, tile)
+        self._cols = np.arange(0, width, tile)
+
+    def update(self, buffer):
+        """Adds the luminance of one subframe, call before the buffer is clobbered"""
+        rgba = buffer.reshape(self.height, self.width, 4)
+        lum = rgba[..., 0] * 0.2126
+        lum += rgba[..., 1] * 0.7152
+        lum += rgba[..., 2] * 0.0722
+        
+        self.count += 1
+        # delta to the old mean
+        lum -= self.mean
+        self.mean += lum / self.count
+        # m2 += delta * (x - new mean), with x - new mean = delta * (n-1)/n
+        self._m2 += (lum * lum) * ((self.count - 1) / self.count)
+
+    def error(self):
+        """Largest mean standard error of the average over all tiles"""
+        if (self.count < 2):
+            return (float('inf'))
+        # standard error of the mean of every pixel
+        err = np.sqrt(self._m2 / ((self.count - 1) * self.count))
+        # mean per tile
+        sums = np.add.reduceat(np.add.reduceat(err, self._rows, axis=0), self._cols, axis=1)
+        sizes = np.outer(np.diff(np.append(self._rows, self.height)), np.diff(np.append(self._cols, self.width)))
+        return (float((sums / sizes).max()))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ mbSubframePool --------------------------
+# –––––––––– subframes shared by frames whose shutters overlap –––––––––––
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class mbSubframePool():
+    """Renders each subframe time of a sequence once
+
+    plan() is told every time each frame will render, render() then only
+    renders a time the first time it is asked for and keeps a copy while
+    other frames still need it. At most size copies are kept, the least
+    recently used goes first (and is rendered again if asked for).
+    """
+    def __init__(self, size=0):
+        self.size = size
+        self.buffers = OrderedDict()
+        self.uses = {}
+        self.hits = 0
+
+    @staticmethod
+    def key(frame, subfr):
+        # the same time from two frames may differ in the last bits
+        return (round(frame + subfr, 6))
+
+    def plan(self, frame, times):
+        """Counts the subframe times a frame will render"""
+        for subfr in times:
+            key = self.key(frame, subfr)
+            self.uses[key] = self.uses.get(key, 0) + 1
+
+    def shared(self):
+        """Number of renders saved by the plan"""
+        return (sum(uses - 1 for uses in self.uses.values()))
+
+    def render(self, frame, subfr, buffer=None, metrics=None, region=None):
+        """renderToArray_2 that reuses what other frames rendered
+
+        Subframes rendered inside a region are not kept, other frames may
+        need the whole of them.
+        """
+        key = self.key(frame, subfr)
+        uses = self.uses.get(key, 1) - 1
+        kept = self.buffers.pop(key, None)
+        if (kept is not None):
+            if (buffer is None or buffer.size != kept.size):
+                buffer = np.empty_like(kept)
+            # the accumulator clobbers the buffer, the copy stays here
+            np.copyto(buffer, kept)
+            self.hits += 1
+            if (metrics is not None):
+                metrics.record['reused'] = metrics.record.get('reused', 0) + 1
+        else:
+            buffer = renderToArray_2(frame, subfr, buffer, metrics)
+            kept = buffer.copy() if (uses > 0 and region is None and self.size > 0) else None
+        
+        if (uses > 0):
+            self.uses[key] = uses
+            if (kept is not None):
+                self.buffers[key] = kept
+                while (len(self.buffers) > self.size):
+                    self.buffers.popitem(last=False)
+        else:
+            self.uses.pop(key, None)
+        return (buffer)
+
+    @property
+    def nbytes(self):
+        return (sum(buffer.nbytes for buffer in self.buffers.values()))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ radicalInverse --------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def radicalInverse(i, base=2):
+    """Van der Corput sequence: 0, 1/2, 1/4, 3/4... every prefix is well spread"""
+    result = 0.0
+    f = 1.0 / base
+    while (i):
+        result += f * (i % base)
+        i //= base
+        f /= base
+    return (result)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- getAccumulator ----------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getAccumulator(scene, width, height):
+    """mbAccumulator for a frame, in RAM or on disk as the settings say
+
+    AUTO goes to disk when the sums would take more than half of the
+    memory that is free right now.
+    """
+    emb_vars = scene.eeveeMotionBlur_vars
+    size = width * height * 4
+    backend = emb_vars.accumulator_backend
+    if (backend == 'AUTO'):
+        itemsize = 8 if emb_vars.use_double_precision else 4
+        # sum and compensation, plus the readback buffer
+        needed = size * (2 * itemsize + 4)
+        available = getAvailableMemory()
+        backend = 'DISK' if (available is not None and needed > available / 2) else 'RAM'
+    if (backend == 'DISK'):
+        embLog(scene, LOG_NORMAL, "accumulating on disk")
+    return (mbAccumulator(size, double=emb_vars.use_double_precision, width=width, 
+        backend=backend, scratch=bpy.path.abspath(emb_vars.scratch_dir)))
+
+def getAvailableMemory(meminfo="/proc/meminfo"):
+    """Memory that can be used in bytes, None if it can't be known"""
+    try:
+        import psutil
+        return (psutil.virtual_memory().available)
+    except ImportError:
+        pass
+    # linux, page cache that can be dropped counts as available
+    try:
+        with open(meminfo) as f:
+            for line in f:
+                if (line.startswith("MemAvailable:")):
+                    return (int(line.split()[1]) * 1024)
+    except (OSError, ValueError, IndexError):
+        pass
+    # free pages only, on other unixes
+    try:
+        return (os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE'))
+    except (AttributeError, ValueError, OSError):
+        return (None)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- getShutterWeight --------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getShutterWeight(position, emb_vars):
+    """How much light the shutter lets in at a position (0 –> 1) of the
+    exposure, a number or an array of them. 0 outside the exposure.
+    """
+    position = np.asarray(position, dtype=np.float64)
+    curve = emb_vars.shutter_curve
+    if (curve == 'TRIANGLE'):
+        weight = 1.0 - np.abs(2.0 * position - 1.0)
+    elif (curve == 'GAUSSIAN'):
+        # +-3 sigma across the exposure
+        weight = np.exp(-0.5 * ((position - 0.5) * 6.0) ** 2)
+    elif (curve == 'CUSTOM'):
+        weight = evaluateShutterCurve(position)
+    else:
+        weight = np.ones_like(position)
+    weight = np.where((position >= 0.0) & (position < 1.0), np.maximum(weight, 0.0), 0.0)
+    return (weight if weight.ndim else float(weight))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# --------------------------- getShutterCurveNode ------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getShutterCurveNode():
+    """RGB curves node whose combined curve is the custom shutter curve,
+    None until it is created with the Create curve button
+    """
+    group = bpy.data.node_groups.get('__emb_shutter_curve__')
+    if (group is None):
+        return (None)
+    return (group.nodes.get('Shutter'))
+
+def evaluateShutterCurve(position):
+    node = getShutterCurveNode()
+    if (node is None):
+        return (np.ones_like(position))
+    mapping = node.mapping
+    if (hasattr(mapping, "initialize")):
+        mapping.initialize()
+    curve = mapping.curves[3]
+    return (np.vectorize(lambda p: mapping.evaluate(curve, p))(np.clip(position, 0.0, 1.0)))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# -------------------------- getSubframeSchedule -------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getSubframeSchedule(samples, shutter_mult, emb_vars, height):
+    """Subframe offsets to render for a frame and the weight of each one
+
+    A box shutter gives the classic even subframes, all weighing 1. With a
+    rolling shutter the exposure of the bottom row starts later, so more
+    subframes are needed to cover it and weights are given per row. The
+    offsets are on a grid of 1/n frames, so frames whose shutters overlap
+    share subframe times.
+    """
+    # time step for each subframe 
+    substep = 1/ceil(samples/shutter_mult)
+    times = [i*substep for i in range(samples)]
+    
+    rolling = emb_vars.rolling_shutter
+    if (rolling > 0):
+        substep = shutter_mult / samples
+        times = [i*substep for i in range(ceil((shutter_mult + rolling) / substep))]
+    weights = getSubframeWeights(times, substep, shutter_mult, emb_vars, height)
+    # centered or closing shutters open before the frame
+    offset = getShutterOffset(shutter_mult, emb_vars)
+    return ([subfr + offset for subfr in times], weights)
+
+# –––––––––––––––––––––––––––– getShutterOffset ––––––––––––––––––––––––––
+# the longest shutter, in frames. Longer than a frame the exposures of
+# consecutive frames overlap
+MAX_SHUTTER = 2.0
+
+def getShutterOffset(shutter_mult, emb_vars):
+    """When the shutter opens, in frames from the frame"""
+    if (emb_vars.shutter_position == 'CENTER'):
+        return (-shutter_mult / 2)
+    if (emb_vars.shutter_position == 'END'):
+        return (-shutter_mult)
+    return (0.0)
+
+def getSubframeWeights(times, step, shutter_mult, emb_vars, height):
+    """Weight of every subframe, each one stands for step frames from its time"""
+    rolling = emb_vars.rolling_shutter
+    if (rolling > 0):
+        # the top row is read first, the image starts with the bottom row
+        start = rolling * (1.0 - np.arange(height) / max(height - 1, 1))
+    weights = []
+    for subfr in times:
+        middle = subfr + step / 2
+        if (rolling > 0):
+            weights.append(getShutterWeight((middle - start) / shutter_mult, emb_vars))
+        else:
+            weights.append(getShutterWeight(middle / shutter_mult, emb_vars))
+    return (weights)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------- subframe cache on disk -----------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getSubframeCachePath(scene, frame, subfr):
+    folder = bpy.path.abspath(scene.eeveeMotionBlur_vars.subframe_cache_dir)
+    return (os.path.join(folder, "%04d" % frame + "_" + "%.6f" % subfr + ".npz"))
+
+def cacheSubframe(scene, frame, subfr, pixels, region, writer=None, first=False):
+    """Keeps a rendered subframe compressed on disk, if the cache is on.
+    The first subframe of a render clears what former renders left
+    """
+    if (not scene.eeveeMotionBlur_vars.use_subframe_cache):
+        return
+    if (first):
+        clearCachedSubframes(scene, frame)
+    width, height = getRenderPixels(scene)
+    # float16 halves the size, the buffer itself is reused so it is copied
+    pixels = pixels.reshape(height, width, 4).astype(np.float16)
+    path = getSubframeCachePath(scene, frame, subfr)
+    if (writer is not None):
+        writer.submit(writeCachedSubframe, path, pixels, region)
+    else:
+        writeCachedSubframe(path, pixels, region)
+
+def writeCachedSubframe(path, pixels, region):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, pixels=pixels, region=np.array(region if region is not None else [-1]))
+    os.replace(tmp, path)
+
+def getCachedSubframePaths(scene, frame):
+    folder = bpy.path.abspath(scene.eeveeMotionBlur_vars.subframe_cache_dir)
+    return (glob.glob(os.path.join(glob.escape(folder), "%04d" % frame + "_*.npz")))
+
+def clearCachedSubframes(scene, frame):
+    """Removes the cached subframes of a frame, they belong to one render"""
+    for path in getCachedSubframePaths(scene, frame):
+        os.remove(path)
+
+def readCachedSubframes(scene, frame):
+    """Cached subframes of a frame sorted by time, [(subframe, pixels, region)]"""
+    cached = []
+    for path in getCachedSubframePaths(scene, frame):
+        subfr = float(os.path.basename(path)[:-4].split("_")[-1])
+        with np.load(path) as data:
+            region = tuple(int(v) for v in data['region'])
+            cached.append((subfr, data['pixels'], region if len(region) == 4 else None))
+    cached.sort(key=lambda entry: entry[0])
+    # a full frame has to come first, it fills what the regions don't cover
+    cached.sort(key=lambda entry: entry[2] is not None)
+    return (cached)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- setRenderBorder ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def setRenderBorder(scene, region):
+    """Limits rendering to a region in pixels, returns the former settings"""
+    render = scene.render
+    orig_border = (render.use_border, render.use_crop_to_border, 
+        render.border_min_x, render.border_min_y, render.border_max_x, render.border_max_y)
+    if (region is None):
+        return (orig_border)
+    
+    width, height = getRenderSize(scene)
+    x0, y0, x1, y1 = region
+    render.use_border = True
+    # keep the full size so the Viewer pixels line up with the base frame
+    render.use_crop_to_border = False
+    render.border_min_x = x0 / width
+    render.border_min_y = y0 / height
+    render.border_max_x = x1 / width
+    render.border_max_y = y1 / height
+    return (orig_border)
+
+def restoreRenderBorder(scene, orig_border):
+    render = scene.render
+    (render.use_border, render.use_crop_to_border, 
+        render.border_min_x, render.border_min_y, render.border_max_x, render.border_max_y) = orig_border
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- samplesFromDelta --------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def samplesFromDelta(maxDelta, shutter_mult, emb_vars):
+    """Adaptive sample count for a max movement in pixels per frame"""
+    # proteccion contra valores inconsistentes
+    if (emb_vars.max_samples < emb_vars.min_samples):
+        emb_vars.max_samples = emb_vars.min_samples
+    
+    samples = ceil((maxDelta*shutter_mult) / emb_vars.pixel_tolerance) #ceil( (maxDelta) / scene.eeveeMotionBlur_vars.adaptive_blur_samples) 
+    
+    if (samples > emb_vars.max_samples):
+        samples = emb_vars.max_samples
+    if (samples < emb_vars.min_samples):
+        samples = emb_vars.min_samples
+    if (samples == 0):
+        samples = 1
+    return (samples)
 
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 # ----------------------------- render 1 frame ---------------------------
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-def renderMBx1fr(realframe, shutter_mult, samples,context):
-    """Renders one frame with motion blur and saves to output folder"""
+def renderMBx1fr(realframe, shutter_mult, samples,context, budget=None, writer=None, info=None, metrics=None, pool=None):
+    """Renders one frame with motion blur and saves to output folder
+
+    budget is an adaptive sample count worked out beforehand (see
+    getSequenceBudgets), when given the motion analysis is skipped.
+    With an mbAsyncWriter the image is saved in the background if the
+    output format allows it. info, a dict, gets the number of samples
+    rendered or the error, and the metrics record of the frame. The
+    timings go to metrics, an mbMetrics, or to a new one. Subframes come
+    from pool, an mbSubframePool shared with the other frames of a
+    sequence, if given. Returns the render time, False if it failed.
+    """
+    C = context
+    scene = C.scene
+    if (metrics is None):
+        metrics = mbMetrics(scene)
+    if (pool is None):
+        pool = mbSubframePool()
+    metrics.begin(realframe)
     try :
-        C = context
-        scene = C.scene
-        
         # timer
         startTime = datetime.now()
         
         # –––––––––––––––––––
         # 1. variables setup
         # –––––––––––––––––––
-        # clamp shutter to 1
-        shutter_mult = min(1, shutter_mult)
+        # clamp shutter to 2, longer than a frame overlaps the next ones
+        shutter_mult = min(MAX_SHUTTER, shutter_mult)
         
         #Setup variable sampling
         
-        # a. adaptive sampling
-        if (scene.eeveeMotionBlur_vars.use_adaptive):
-            # proteccion contra valores inconsistentes
-            if (scene.eeveeMotionBlur_vars.max_samples < scene.eeveeMotionBlur_vars.min_samples):
-                scene.eeveeMotionBlur_vars.max_samples = scene.eeveeMotionBlur_vars.min_samples
-            
-            maxDelta = getMaxDelta(context)
-            # print("Max delta is: " + str(maxDelta))
-            samples = ceil((maxDelta*shutter_mult) / scene.eeveeMotionBlur_vars.pixel_tolerance) #ceil( (maxDelta) / scene.eeveeMotionBlur_vars.adaptive_blur_samples) 
-            
-            if (samples > scene.eeveeMotionBlur_vars.max_samples):
-                samples = scene.eeveeMotionBlur_vars.max_samples
-            if (samples < scene.eeveeMotionBlur_vars.min_samples):
-                samples = scene.eeveeMotionBlur_vars.min_samples
-            if (samples == 0):
-                samples = 1
+        # a. progressive sampling, the noise decides when to stop
+        if (scene.eeveeMotionBlur_vars.use_progressive and not scene.eeveeMotionBlur_vars.use_multilayer):
+            samples = getProgressiveLimits(scene.eeveeMotionBlur_vars)[1]
+            metrics.record['sampling'] = 'progressive'
+        
+        # b. adaptive sampling
+        elif (scene.eeveeMotionBlur_vars.use_adaptive):
+            if (budget is None):
+                maxDelta = getMaxDelta(context, realframe)
+                metrics.record['max_delta'] = maxDelta
+                budget = samplesFromDelta(maxDelta, shutter_mult, scene.eeveeMotionBlur_vars)
+            samples = budget
+            metrics.record['sampling'] = 'adaptive'
             
-        # b. static sampling
+        # c. static sampling
         else :
             # static samples
             samples = ceil(scene.eevee.motion_blur_samples) 
+            metrics.record['sampling'] = 'static'
         
         # total number of subframes including unrendered
         fr_multiplier = ceil(samples/shutter_mult) # 12
@@ -154,15 +1097,8 @@ def renderMBx1fr(realframe, shutter_mult, samples,context):
         # time step for each subframe 
         substep = 1/fr_multiplier
         
-        # where to save the files
-        myRenderFolder = bpy.context.scene.render.filepath
-        
-        # factor to scale the size of render
-        resolution_factor = bpy.context.scene.render.resolution_percentage/100
-        
         # effective render resolution
-        renderWidth = round(bpy.context.scene.render.resolution_x * resolution_factor)
-        renderHeight = round(bpy.context.scene.render.resolution_y * resolution_factor)
+        renderWidth, renderHeight = getRenderPixels(bpy.context.scene)
         
         # gamma de la imagen final 0.454545
         mygamma = bpy.context.scene.eeveeMotionBlur_vars.gamma
@@ -171,249 +1107,1995 @@ def renderMBx1fr(realframe, shutter_mult, samples,context):
         orig_mb = bpy.context.scene.eevee.use_motion_blur
         bpy.context.scene.eevee.use_motion_blur = False
         
-        #### temp image setup
-        image_name = '__motion_blur_temp__'
-        if image_name in bpy.data.images:
-            bpy.data.images.remove(bpy.data.images[image_name])
-        image_object = bpy.data.images.new(name=image_name, alpha=True, width=renderWidth, height=renderHeight)
-        # image_object.use_alpha = True
-        image_object.alpha_mode = 'STRAIGHT'
-        image_object = bpy.data.images[image_name]
-        num_pixels = len(image_object.pixels)
         
-        # –––––––––––––––––––
-        # 2. Setup Compositor
-        mbCompositorSetup()
+        if (scene.eeveeMotionBlur_vars.use_multilayer):
+            # every pass of the view layers, straight from the render result
+            times, weights = getSubframeSchedule(samples, shutter_mult, scene.eeveeMotionBlur_vars, renderHeight)
+            metrics.log(LOG_NORMAL, "rendering %d multilayer subframe samples", len(times))
+            samples = renderMultilayer(realframe, times, weights, context, writer, metrics)
+        else:
+            # readback buffer, reused for every subframe
+            readback = np.empty(renderWidth * renderHeight * 4, dtype=np.float32)
         
-        
-        
-        # 
-        print ('rendering ' + str(samples) + ' subframe samples')
-        # –––––––––––––––––––
-        # 3. Render       
-        # render frame base y setup array
-        myrender_arr = renderToArray_2(realframe, 0.0)/samples
-        print("\trendered subframe #1/"+ str(samples)+ " ("+ str(realframe) + ".0)" )
-        
-        # render de cada subframe
-        for i in range(1, samples):
-            subfr = i*substep
+            # 
+            metrics.log(LOG_NORMAL, "rendering %d subframe samples", samples)
+            # –––––––––––––––––––
+            # 3. Render       
+            # previews blur low resolution subframes over a full quality
+            # base, they accumulate on their own
+            preview = (scene.eeveeMotionBlur_vars.quality_preset != 'FINAL' and 
+                not scene.eeveeMotionBlur_vars.use_progressive)
+            # render frame base y setup array
+            accumulator = None if preview else getAccumulator(scene, renderWidth, renderHeight)
+            metrics.memory((accumulator.nbytes if accumulator else 0) + readback.nbytes + pool.nbytes)
+            # when each subframe is rendered and how much it counts
+            times, weights = getSubframeSchedule(samples, shutter_mult, scene.eeveeMotionBlur_vars, renderHeight)
+            # frame already averaged, only gamma is left
+            finished = None
             
-            temparray = renderToArray_2(realframe, subfr)
-            # suma ponderada para autoaverage
-            myrender_arr += (temparray/samples)
+            # only the camera moves: the subframes are reprojected
+            cameras = None
+            if (scene.eeveeMotionBlur_vars.use_reprojection and not scene.eeveeMotionBlur_vars.use_progressive and 
+                not preview and len(times) > 1 and OpenEXR is not None):
+                cameras = getCameraOnlyMotion(context, realframe, times)
             
-            print("\trendered subframe #" + str(i+1) + "/" + str(samples) + " (" + str(realframe+subfr) + ")" )
-        
-        # assign array to image with gamma    
-        image_object.pixels = myrender_arr ** mygamma 
+            # fast objects get more subframes than the rest of the frame
+            tiers = None
+            layers = []
+            if (scene.eeveeMotionBlur_vars.use_motion_tiers and cameras is None and not preview and 
+                not scene.eeveeMotionBlur_vars.use_progressive and hasattr(scene.camera, 'is_holdout')):
+                tiers = getMotionTiers(context, realframe, shutter_mult)
             
-        # –––––––––––––––––––
-        # 4. Save the image
-        # Now respects the fileformat in render output
-        image_object.file_format = bpy.context.scene.render.image_settings.file_format
-        # myRenderFolder
-        image_object.filepath_raw = myRenderFolder + "%04d" % realframe + bpy.context.scene.render.file_extension
-        image_object.save_render(filepath =  bpy.path.abspath(C.scene.render.filepath) + "%04d" % realframe + bpy.context.scene.render.file_extension, scene = C.scene )
-        #image_object.save()
+            # subframes straight from the renderer, the compositor runs once
+            raw = (scene.eeveeMotionBlur_vars.use_raw_capture and cameras is None and tiers is None and 
+                not preview and not scene.eeveeMotionBlur_vars.use_progressive)
+            if (raw and useCompositor(scene) and 
+                len([node for node in scene.node_tree.nodes if node.type == 'R_LAYERS']) != 1):
+                metrics.log(LOG_QUIET, "raw capture needs a single Render Layers node, compositing every subframe")
+                raw = False
+            
+            # –––––––––––––––––––
+            # 2. Setup Compositor
+            if (not raw):
+                mbCompositorSetup()
+            
+            if (scene.eeveeMotionBlur_vars.use_progressive):
+                samples = renderProgressive(realframe, shutter_mult, context, accumulator, readback, renderWidth, renderHeight, metrics)
+            elif (preview):
+                metrics.log(LOG_NORMAL, "%s preview", scene.eeveeMotionBlur_vars.quality_preset.lower())
+                samples = len(times)
+                finished = renderPreview(realframe, samples, shutter_mult, context, readback, metrics)
+            elif (cameras is not None):
+                metrics.log(LOG_NORMAL, "only the camera moves, reprojecting subframes")
+                samples = len(times)
+                metrics.record['rendered'] = renderReprojected(realframe, times, weights, cameras, 
+                    context, accumulator, readback, metrics)
+            elif (tiers is not None):
+                metrics.log(LOG_NORMAL, "rendering %d motion tiers", len(tiers))
+                layers, samples = renderMotionTiers(realframe, shutter_mult, tiers, context, 
+                    accumulator, readback, metrics)
+                metrics.record['tiers'] = [[len(names), tier_samples, region] for names, tier_samples, region in tiers]
+            elif (raw):
+                samples = len(times)
+                finished = renderRaw(realframe, times, weights, context, accumulator, readback, metrics)
+            else:
+                samples = len(times)
+            
+                # a frame interrupted halfway goes on from its last checkpoint
+                interval = scene.eeveeMotionBlur_vars.checkpoint_interval
+                checkpoint = getCheckpointPath(scene, realframe) if interval else None
+                meta = {'frame' : realframe, 'samples' : samples, 'substep' : substep, 
+                    'curve' : scene.eeveeMotionBlur_vars.shutter_curve, 
+                    'rolling' : scene.eeveeMotionBlur_vars.rolling_shutter, 
+                    'position' : scene.eeveeMotionBlur_vars.shutter_position}
+                start = 0
+                region = None
+                if (checkpoint and scene.eeveeMotionBlur_vars.use_resume):
+                    saved = accumulator.load(checkpoint, meta)
+                    if (saved):
+                        start = saved['next']
+                        region = saved['region']
+                        metrics.log(LOG_NORMAL, "resuming frame %d from subframe #%d", realframe, start + 1)
+            
+                if (start == 0):
+                    t = subframe_start = time.perf_counter()
+                    readback = pool.render(realframe, times[0], readback, metrics)
+                    t = time.perf_counter()
+                    cacheSubframe(scene, realframe, times[0], readback, None, writer, first=True)
+                    t = metrics.add('cache', t)
+                    accumulator.add(readback, weights[0])
+                    metrics.add('accumulate', t)
+                    metrics.subframe(times[0], subframe_start)
+                    metrics.log(LOG_NORMAL, "\trendered subframe #1/%d (%s)", samples, realframe + times[0])
+                    start = 1
+            
+                    # only the part of the frame that moves is rendered again.
+                    # Not with a rolling shutter, the first subframe alone
+                    # weighs nothing on the rows exposed later
+                    if (scene.eeveeMotionBlur_vars.use_regions and samples > 1 and 
+                        scene.eeveeMotionBlur_vars.rolling_shutter == 0):
+                        region = getMovingRegion(context, realframe, times)
+                if (region is not None and (region[2] <= region[0] or region[3] <= region[1])):
+                    # nothing visible moves, the base frame is the result
+                    samples = 1
+                orig_border = setRenderBorder(scene, region)
+        
+                # render de cada subframe
+                try:
+                    for i in range(start, samples):
+                        subfr = times[i]
+                
+                        subframe_start = time.perf_counter()
+                        readback = pool.render(realframe, subfr, readback, metrics, region)
+                        t = time.perf_counter()
+                        cacheSubframe(scene, realframe, subfr, readback, region, writer)
+                        t = metrics.add('cache', t)
+                        # suma compensada, el promedio se hace al final
+                        accumulator.add(readback, weights[i], region=region)
+                        metrics.add('accumulate', t)
+                        metrics.subframe(subfr, subframe_start)
+                
+                        metrics.log(LOG_NORMAL, "\trendered subframe #%d/%d (%s)", i + 1, samples, realframe + subfr)
+                        if (checkpoint and (i + 1) % interval == 0 and (i + 1) < samples):
+                            accumulator.save(checkpoint, dict(meta, next=i + 1, region=region))
+                finally:
+                    restoreRenderBorder(scene, orig_border)
+                if (checkpoint and os.path.exists(checkpoint)):
+                    os.remove(checkpoint)
+        
+            # average and gamma in place
+            t = time.perf_counter()
+            if (tiers is not None):
+                myrender_arr = compositeTiers(accumulator, layers, mygamma)
+            elif (finished is not None):
+                myrender_arr = finished
+                if (mygamma != 1.0):
+                    np.power(myrender_arr, mygamma, out=myrender_arr)
+            else:
+                myrender_arr = accumulator.finish(mygamma)
+            t = metrics.add('accumulate', t)
+        
+            # –––––––––––––––––––
+            # 4. Save the image
+            if (saveMBFrame(scene, realframe, myrender_arr, renderWidth, renderHeight, writer) and accumulator is not None):
+                accumulator.close()
+            metrics.add('save', t)
         
         rendertime = ( datetime.now() - startTime)
-        print("EMB Render frame "+ str(realframe) + " in " + str( rendertime).split(".")[0])
-    except:
+        metrics.log(LOG_NORMAL, "EMB Render frame %d in %s", realframe, str(rendertime).split(".")[0])
+        record = metrics.end(samples=samples)
+        if (info is not None):
+            info['samples'] = samples
+    except Exception as e:
+        # the sequence goes on, the journal keeps track of the failure
+        traceback.print_exc()
+        embLog(scene, LOG_QUIET, "EMB Render frame %d FAILED: %s", realframe, e)
+        record = metrics.end(error=str(e))
+        if (info is not None):
+            info['error'] = str(e)
         rendertime = False
-        pass
+    if (info is not None):
+        info['metrics'] = record
+
+    return (rendertime) # {'FINISHED'}
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------- saveMBFrame ----------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def saveMBFrame(scene, realframe, pixels, width, height, writer=None):
+    """Saves a finished frame to the output folder
+
+    Returns True if it was saved in place, False if it was queued in the
+    writer, which then owns the buffer.
+    """
+    # encoded in the background while the next frame renders
+    if (writer is not None and canSaveAsync(scene)):
+        writer.put(getOutputPath(scene, realframe), pixels, width, height, scene.render.image_settings)
+        return (False)
+    
+    #### temp image setup
+    image_object = getTempImage(width, height)
+    
+    # assign array to image with gamma, bulk copy (pixels are float32)
+    if (pixels.dtype != np.float32):
+        pixels = pixels.astype(np.float32)
+    image_object.pixels.foreach_set(pixels)
+    image_object.update()
+    
+    # Now respects the fileformat in render output
+    image_object.file_format = scene.render.image_settings.file_format
+    # myRenderFolder
+    image_object.filepath_raw = scene.render.filepath + "%04d" % realframe + scene.render.file_extension
+    image_object.save_render(filepath = getOutputPath(scene, realframe), scene = scene )
+    #image_object.save()
+    return (True)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# -------------------------- recompositeMBx1fr ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def recompositeMBx1fr(realframe, context):
+    """Averages the cached subframes of a frame again with the current
+    shutter curve, shutter length and gamma, and saves it. Nothing is
+    rendered. Returns the number of subframes used, 0 if none are cached
+    or they can't be used.
+    """
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    shutter_mult = min(MAX_SHUTTER, scene.eevee.motion_blur_shutter)
+    cached = readCachedSubframes(scene, realframe)
+    if (not cached):
+        return (0)
+    if (emb_vars.rolling_shutter > 0 and any(region is not None for subfr, pixels, region in cached)):
+        # outside the regions only the first subframe is cached
+        embLog(scene, LOG_QUIET, "frame %d was rendered in moving regions, render it again for a rolling shutter", realframe)
+        return (0)
+    
+    # from when the shutter opens
+    offset = getShutterOffset(shutter_mult, emb_vars)
+    times = [subfr - offset for subfr, pixels, region in cached]
+    height, width = cached[0][1].shape[:2]
+    # the subframes were spread evenly, each one stands for one step
+    ordered = sorted(times)
+    step = (ordered[1] - ordered[0]) if len(ordered) > 1 else shutter_mult
+    weights = getSubframeWeights(times, step, shutter_mult, emb_vars, height)
+    if (ordered[-1] + step < shutter_mult + emb_vars.rolling_shutter - 1e-6):
+        embLog(scene, LOG_QUIET, "the cache only covers %s of the shutter, render again for longer shutters", round(ordered[-1] + step, 3))
+    
+    accumulator = mbAccumulator(width * height * 4, double=emb_vars.use_double_precision, width=width)
+    for (subfr, pixels, region), weight in zip(cached, weights):
+        accumulator.add(pixels.astype(np.float32).ravel(), weight, region=region)
+    pixels = accumulator.finish(emb_vars.gamma)
+    saveMBFrame(scene, realframe, pixels, width, height)
+    return (len(cached))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# --------------------------- renderProgressive --------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def renderProgressive(realframe, shutter_mult, context, accumulator, readback, width, height, metrics):
+    """Renders subframes until the average is clean enough, returns the count
+
+    Subframes are taken in van der Corput order through the shutter, so
+    stopping after any number of them still covers the whole shutter.
+    """
+    emb_vars = context.scene.eeveeMotionBlur_vars
+    min_samples, max_samples = getProgressiveLimits(emb_vars)
+    tracker = mbVarianceTracker(width, height, emb_vars.progressive_tile)
+    
+    for i in range(max_samples):
+        position = radicalInverse(i)
+        subfr = position * shutter_mult + getShutterOffset(shutter_mult, emb_vars)
+        subframe_start = time.perf_counter()
+        readback = renderToArray_2(realframe, subfr, readback, metrics)
+        t = time.perf_counter()
+        cacheSubframe(context.scene, realframe, subfr, readback, None, None, first=(i == 0))
+        t = metrics.add('cache', t)
+        tracker.update(readback)
+        accumulator.add(readback, getShutterWeight(position, emb_vars))
+        metrics.add('accumulate', t)
+        metrics.subframe(subfr, subframe_start)
+        
+        error = tracker.error()
+        metrics.log(LOG_NORMAL, "\trendered subframe #%d (%s), noise %.5f", i + 1, realframe + subfr, error)
+        if (i + 1 >= min_samples and error < emb_vars.noise_threshold):
+            break
+    return (i + 1)
+
+def getProgressiveLimits(emb_vars):
+    """(fewest, most) subframes progressive sampling renders, it needs two
+    to measure the noise
+    """
+    min_samples = max(emb_vars.min_samples, 2)
+    return ((min_samples, max(emb_vars.max_samples, min_samples)))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- renderMultilayer --------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def renderMultilayer(realframe, times, weights, context, writer, metrics):
+    """Renders the subframes with all their passes and saves them combined
+
+    Blender writes every subframe as a multilayer EXR with all the passes
+    of the view layers, which is read back with OpenEXR and combined pass
+    by pass (see mbPassAccumulator). The result is a single multilayer EXR
+    in the output folder. Returns the number of subframes rendered.
+    """
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    if (OpenEXR is None):
+        raise RuntimeError("render passes need the OpenEXR python module")
+    orig_output = setScratchOutput(scene)
+    accumulator = mbPassAccumulator(emb_vars.use_double_precision)
+    try:
+        for i, subfr in enumerate(times):
+            subframe_start = time.perf_counter()
+            channels, width, height = renderPasses(realframe, subfr, metrics)
+            t = time.perf_counter()
+            accumulator.add(channels, weights[i])
+            metrics.add('accumulate', t)
+            metrics.subframe(subfr, subframe_start)
+            metrics.memory(accumulator.nbytes)
+            metrics.log(LOG_NORMAL, "\trendered subframe #%d/%d (%s), %d channels", i + 1, len(times), realframe + subfr, len(channels))
+    finally:
+        restoreScratchOutput(scene, orig_output)
+
+    t = time.perf_counter()
+    channels = accumulator.finish()
+    t = metrics.add('accumulate', t)
+    path = getOutputPath(scene, realframe)
+    if (writer is not None):
+        writer.submit(writeMultilayerEXR, path, channels, width, height)
+    else:
+        writeMultilayerEXR(path, channels, width, height)
+    metrics.add('save', t)
+    return (len(times))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# -------------------------------- renderRaw -----------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def renderRaw(realframe, times, weights, context, accumulator, readback, metrics):
+    """Averages raw renders and runs the compositor once on the average
+
+    Every subframe but the last is rendered with compositing off and read
+    from an EXR in scratch (renderRawToArray). The last one goes through
+    the compositor with the average of the others added to its Render
+    Layers output (see setRawCompositor), so the compositor runs once per
+    frame, on the averaged image. Without a compositor every subframe is
+    raw. Returns the frame before gamma.
+    """
+    scene = context.scene
+    compositing = useCompositor(scene)
+    raw_times = times[:-1] if compositing else times
+    orig_compositing = scene.render.use_compositing
+    orig_output = setScratchOutput(scene, 'OPEN_EXR')
+    try:
+        scene.render.use_compositing = False
+        for i, subfr in enumerate(raw_times):
+            subframe_start = time.perf_counter()
+            readback = renderRawToArray(realframe, subfr, readback, metrics)
+            t = time.perf_counter()
+            accumulator.add(readback, weights[i])
+            metrics.add('accumulate', t)
+            metrics.subframe(subfr, subframe_start)
+            metrics.log(LOG_NORMAL, "\trendered raw subframe #%d/%d (%s)", i + 1, len(times), realframe + subfr)
+        if (not compositing):
+            return (accumulator.finish(1.0))
+
+        # the last subframe completes the average inside the compositor
+        t = time.perf_counter()
+        accumulator.weight += weights[-1]
+        fac = weights[-1] / accumulator.weight
+        partial = accumulator.finish(1.0)
+        metrics.add('accumulate', t)
+        scene.render.use_compositing = True
+        # the Viewer goes in first, so its links are restored with the rest
+        mbCompositorSetup()
+        orig_nodes = setRawCompositor(scene, partial, fac, accumulator.width, accumulator.height)
+        try:
+            subframe_start = time.perf_counter()
+            readback = renderToArray_2(realframe, times[-1], readback, metrics)
+            metrics.subframe(times[-1], subframe_start)
+        finally:
+            restoreRawCompositor(scene, orig_nodes)
+        metrics.log(LOG_NORMAL, "\trendered subframe #%d/%d (%s) through the compositor", len(times), len(times), realframe + times[-1])
+    finally:
+        scene.render.use_compositing = orig_compositing
+        restoreScratchOutput(scene, orig_output)
+    return (readback)
+
+def useCompositor(scene):
+    """True if the compositor is on and something goes to a Composite node"""
+    if (not scene.use_nodes or not scene.render.use_compositing or scene.node_tree is None):
+        return (False)
+    return (any(node.type == 'COMPOSITE' and node.inputs[0].links for node in scene.node_tree.nodes))
+
+def getFloatImage(name, width, height):
+    """Float image datablock of a size, reused if it fits"""
+    if (name in bpy.data.images):
+        image = bpy.data.images[name]
+        if (tuple(image.size) == (width, height) and image.is_float):
+            return (image)
+        bpy.data.images.remove(image)
+    return (bpy.data.images.new(name=name, width=width, height=height, alpha=True, float_buffer=True))
+
+def setRawCompositor(scene, pixels, fac, width, height):
+    """Adds pixels times 1 to the Render Layers output times fac
+
+    pixels is the weighted sum of the raw subframes over the total weight
+    and fac the weight of the subframe being rendered, one per row, so the
+    Render Layers output becomes the average of the frame and every node
+    after it sees that. Image and Alpha are added apart and put together
+    again with Set Alpha. Returns what restoreRawCompositor needs.
+    """
+    tree = scene.node_tree
+    links = tree.links
+    layers = [node for node in tree.nodes if node.type == 'R_LAYERS'][0]
+    orig_links = [(link.from_socket, link.to_socket) for link in links
+        if link.from_node == layers and link.from_socket.name in ('Image', 'Alpha')]
+
+    image = getFloatImage('__motion_blur_partial__', width, height)
+    image.pixels.foreach_set(pixels.astype(np.float32, copy=False))
+    # premultiplied like the render
+    image.alpha_mode = 'PREMUL'
+    source = tree.nodes.new('CompositorNodeImage')
+    source.image = image
+    color = tree.nodes.new('CompositorNodeMixRGB')
+    alpha = tree.nodes.new('CompositorNodeMixRGB')
+    for mix in (color, alpha):
+        mix.blend_type = 'ADD'
+        mix.use_clamp = False
+    merge = tree.nodes.new('CompositorNodeSetAlpha')
+    if (hasattr(merge, 'mode')):
+        merge.mode = 'REPLACE_ALPHA'
+    nodes = [source, color, alpha, merge]
+
+    if (np.ptp(fac) == 0):
+        color.inputs[0].default_value = alpha.inputs[0].default_value = float(fac[0])
+    else:
+        # rolling shutter, a weight per row
+        weight = getFloatImage('__motion_blur_fac__', width, height)
+        weight.pixels.foreach_set(np.repeat(fac.astype(np.float32), width * 4))
+        factor = tree.nodes.new('CompositorNodeImage')
+        factor.image = weight
+        nodes.append(factor)
+        links.new(factor.outputs['Image'], color.inputs[0])
+        links.new(factor.outputs['Image'], alpha.inputs[0])
+
+    links.new(source.outputs['Image'], color.inputs[1])
+    links.new(layers.outputs['Image'], color.inputs[2])
+    links.new(source.outputs['Alpha'], alpha.inputs[1])
+    links.new(layers.outputs['Alpha'], alpha.inputs[2])
+    links.new(color.outputs[0], merge.inputs['Image'])
+    links.new(alpha.outputs[0], merge.inputs['Alpha'])
+    for from_socket, to_socket in orig_links:
+        links.new(merge.outputs[0] if from_socket.name == 'Image' else alpha.outputs[0], to_socket)
+    return ((nodes, orig_links))
+
+def restoreRawCompositor(scene, orig_nodes):
+    nodes, orig_links = orig_nodes
+    tree = scene.node_tree
+    for node in nodes:
+        tree.nodes.remove(node)
+    for from_socket, to_socket in orig_links:
+        tree.links.new(from_socket, to_socket)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ renderPreview ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# resolution scale and TAA samples divisor of each quality preset
+PREVIEW_PRESETS = {'PREVIEW_HIGH' : (0.5, 4), 'PREVIEW_FAST' : (0.25, 8)}
+
+def renderPreview(realframe, samples, shutter_mult, context, readback, metrics):
+    """Full quality first subframe, blur from cheap ones
+
+    The first subframe is rendered as set. All of them, the first again,
+    are then rendered at a fraction of the resolution and of the Eevee TAA
+    samples (PREVIEW_PRESETS). The blur is what their average changes over
+    the cheap first subframe, which is scaled up and added to the full
+    quality one, so still parts keep their full detail. Returns the frame
+    before gamma.
+    """
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    scale, divisor = PREVIEW_PRESETS[emb_vars.quality_preset]
+    width, height = getRenderPixels(scene)
+    times, weights = getSubframeSchedule(samples, shutter_mult, emb_vars, height)
+    
+    subframe_start = time.perf_counter()
+    base = renderToArray_2(realframe, times[0], readback, metrics).copy()
+    metrics.subframe(times[0], subframe_start)
+    metrics.log(LOG_NORMAL, "\trendered full quality subframe (%s)", realframe + times[0])
+    if (len(times) == 1):
+        return (base)
+    
+    orig_percentage = scene.render.resolution_percentage
+    orig_taa = scene.eevee.taa_render_samples
+    try:
+        scene.render.resolution_percentage = max(1, int(round(orig_percentage * scale)))
+        scene.eevee.taa_render_samples = max(1, orig_taa // divisor)
+        low = None
+        for i, subfr in enumerate(times):
+            subframe_start = time.perf_counter()
+            low = renderToArray_2(realframe, subfr, low, metrics)
+            t = time.perf_counter()
+            if (i == 0):
+                # sized as the render came out
+                low_width, low_height = bpy.data.images['Viewer Node'].size
+                # rolling shutter weights follow the rows of the small frame
+                weights = getSubframeSchedule(samples, shutter_mult, emb_vars, low_height)[1]
+                accumulator = mbAccumulator(low_width * low_height * 4, double=emb_vars.use_double_precision, width=low_width)
+                low_base = low.copy()
+            accumulator.add(low, weights[i])
+            metrics.add('accumulate', t)
+            metrics.subframe(subfr, subframe_start)
+            metrics.log(LOG_NORMAL, "\trendered preview subframe #%d/%d (%s)", i + 1, len(times), realframe + subfr)
+    finally:
+        scene.render.resolution_percentage = orig_percentage
+        scene.eevee.taa_render_samples = orig_taa
+    
+    t = time.perf_counter()
+    blur = accumulator.finish(1.0)
+    blur -= low_base
+    base += upsampleBilinear(blur.reshape(low_height, low_width, 4), width, height).ravel()
+    accumulator.close()
+    metrics.add('accumulate', t)
+    return (base)
+
+def upsampleBilinear(image, width, height):
+    """(h, w, channels) image scaled to (height, width, channels), pixel
+    centres aligned and edges clamped
+    """
+    src_height, src_width = image.shape[:2]
+    
+    def axis(size, src_size):
+        co = np.clip((np.arange(size) + 0.5) * (src_size / size) - 0.5, 0, src_size - 1)
+        first = np.floor(co).astype(np.int64)
+        last = np.minimum(first + 1, src_size - 1)
+        return (first, last, (co - first).astype(image.dtype))
+    
+    y0, y1, fy = axis(height, src_height)
+    x0, x1, fx = axis(width, src_width)
+    fx = fx[None, :, None]
+    top = image[y0][:, x0] * (1 - fx) + image[y0][:, x1] * fx
+    bottom = image[y1][:, x0] * (1 - fx) + image[y1][:, x1] * fx
+    fy = fy[:, None, None]
+    return (top * (1 - fy) + bottom * fy)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# --------------------------- renderReprojected --------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def renderReprojected(realframe, times, weights, cameras, context, accumulator, readback, metrics):
+    """Subframes of a frame where only the camera moves, without rendering them
+
+    The first subframe is rendered once with its depth, every pixel is put
+    back in the world and splatted through the camera of each subframe.
+    Where the reprojected frame has holes (parts hidden in the first
+    subframe, or outside it) over the threshold, the subframe is rendered
+    for real inside the rectangle around the holes. Smaller holes keep the
+    first subframe. Returns the number of real renders.
+    """
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    view_layer = context.view_layer
+    orig_pass_z = view_layer.use_pass_z
+    orig_output = setScratchOutput(scene)
+    try:
+        view_layer.use_pass_z = True
+        channels, width, height = renderPasses(realframe, times[0], metrics)
+    finally:
+        view_layer.use_pass_z = orig_pass_z
+        restoreScratchOutput(scene, orig_output)
+    t = time.perf_counter()
+    color = getPassPixels(channels, 'Combined', 'RGBA')
+    depth = getPassPixels(channels, 'Depth', 'Z')
+    if (color is None or depth is None):
+        raise RuntimeError("the render has no combined or depth pass to reproject")
+    base = np.ascontiguousarray(color, dtype=np.float32).ravel()
+    world = unprojectPixels(depth[..., 0], cameras[0])
+    t = metrics.add('reproject', t)
+    accumulator.add(base.copy(), weights[0])
+    metrics.add('accumulate', t)
+
+    rendered = 1
+    compositor_ready = False
+    for i in range(1, len(times)):
+        subframe_start = t = time.perf_counter()
+        pixels, holes = splatPixels(base, cameras[i].project(world), width, height)
+        t = metrics.add('reproject', t)
+
+        if (holes.mean() > emb_vars.reprojection_holes):
+            # render for real only around the holes
+            rows, cols = np.nonzero(holes.reshape(height, width))
+            pad = emb_vars.region_padding
+            region = (max(0, cols.min() - pad), max(0, rows.min() - pad),
+                min(width, cols.max() + 1 + pad), min(height, rows.max() + 1 + pad))
+            if (not compositor_ready):
+                mbCompositorSetup()
+                compositor_ready = True
+            orig_border = setRenderBorder(scene, region)
+            try:
+                readback = renderToArray_2(realframe, times[i], readback, metrics)
+            finally:
+                restoreRenderBorder(scene, orig_border)
+            t = time.perf_counter()
+            x0, y0, x1, y1 = region
+            pixels.reshape(height, width, 4)[y0:y1, x0:x1] = readback.reshape(height, width, 4)[y0:y1, x0:x1]
+            rendered += 1
+            metrics.log(LOG_NORMAL, "\trendered subframe #%d/%d (%s) in %s, %.1f%% holes",
+                i + 1, len(times), realframe + times[i], region, holes.mean() * 100)
+        else:
+            # small holes keep the first subframe
+            pixels.reshape(-1, 4)[holes] = base.reshape(-1, 4)[holes]
+            metrics.log(LOG_NORMAL, "\treprojected subframe #%d/%d (%s)", i + 1, len(times), realframe + times[i])
+        accumulator.add(pixels, weights[i])
+        metrics.add('accumulate', t)
+        metrics.subframe(times[i], subframe_start)
+    return (rendered)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- renderMotionTiers -------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def renderMotionTiers(realframe, shutter_mult, tiers, context, accumulator, readback, metrics):
+    """Renders each motion tier with its own number of subframes
+
+    The slow tier, with the objects of the other tiers hidden, goes to
+    accumulator. Every faster tier is rendered on a transparent film with
+    everything else as holdout, so what is in front of it cuts it out,
+    into an accumulator of its own. Only its region is rendered, the film
+    stays empty around it. Returns those accumulators, fastest last, for
+    compositeTiers(), and the number of renders.
+    """
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    width, height = accumulator.width, accumulator.height
+    fast = set().union(*(names for names, samples, region in tiers[1:]))
+    # geometry that can hide a tier, lights keep lighting
+    solid = [obj for obj in scene.objects if (not obj.hide_render and
+        obj.type not in ('LIGHT', 'CAMERA', 'LIGHT_PROBE', 'SPEAKER', 'EMPTY'))]
+    orig_hide = {obj.name : obj.hide_render for obj in solid}
+    orig_holdout = {obj.name : obj.is_holdout for obj in solid}
+    orig_transparent = scene.render.film_transparent
+
+    layers = []
+    renders = 0
+    try:
+        for n, (names, samples, region) in enumerate(tiers):
+            times, weights = getSubframeSchedule(samples, shutter_mult, emb_vars, height)
+            if (n == 0):
+                target = accumulator
+                for obj in solid:
+                    obj.hide_render = obj.name in fast
+            elif (region is not None and (region[2] <= region[0] or region[3] <= region[1])):
+                # its objects stay off screen
+                continue
+            else:
+                target = getAccumulator(scene, width, height)
+                layers.append(target)
+                scene.render.film_transparent = True
+                for obj in solid:
+                    obj.hide_render = False
+                    obj.is_holdout = obj.name not in names
+            metrics.log(LOG_NORMAL, "\ttier %d: %d objects, %d subframes in %s", n + 1, len(names), len(times), 
+                "the whole frame" if region is None else region)
+
+            orig_border = setRenderBorder(scene, region)
+            try:
+                for i, subfr in enumerate(times):
+                    subframe_start = time.perf_counter()
+                    readback = renderToArray_2(realframe, subfr, readback, metrics)
+                    t = time.perf_counter()
+                    target.add(readback, weights[i])
+                    metrics.add('accumulate', t)
+                    metrics.subframe(subfr, subframe_start)
+            finally:
+                restoreRenderBorder(scene, orig_border)
+            renders += len(times)
+            metrics.memory(accumulator.nbytes + sum(layer.nbytes for layer in layers))
+    finally:
+        for obj in solid:
+            obj.hide_render = orig_hide[obj.name]
+            obj.is_holdout = orig_holdout[obj.name]
+        scene.render.film_transparent = orig_transparent
+    return (layers, renders)
+
+def compositeTiers(accumulator, layers, gamma=1.0):
+    """Averages the tiers and puts the faster ones over the slow one
+
+    The tiers are premultiplied (transparent film), so it's a plain over.
+    Gamma is applied to the result, like mbAccumulator.finish() does.
+    """
+    pixels = accumulator.finish(1.0)
+    result = pixels.reshape(-1, 4)
+    for layer in layers:
+        over = layer.finish(1.0).reshape(-1, 4)
+        result *= (1.0 - over[:, 3:4])
+        result += over
+        layer.close()
+    if (gamma != 1.0):
+        np.power(pixels, gamma, out=pixels)
+    return (pixels)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------- splatPixels ----------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def splatPixels(pixels, target, width, height):
+    """Moves every pixel of a flat RGBA frame to where target says
+
+    target is (pixels, 3): x, y in camera space (0 –> 1) and depth, as
+    given by mbProjection.project(). When pixels land on the same spot the
+    nearest one wins. Single pixel cracks between splats are filled from
+    their neighbours. Returns the new flat frame and a mask of the pixels
+    nothing landed on.
+    """
+    x = np.floor(target[:, 0] * width).astype(np.int64)
+    y = np.floor(target[:, 1] * height).astype(np.int64)
+    valid = (target[:, 2] > 0) & (x >= 0) & (x < width) & (y >= 0) & (y < height)
+    source = np.flatnonzero(valid)
+    index = (y * width + x)[source]
+
+    # nearest first, then the first hit of every pixel
+    order = np.argsort(target[source, 2], kind='stable')
+    index, first = np.unique(index[order], return_index=True)
+    source = source[order[first]]
+
+    out = np.zeros((height * width, 4), dtype=np.float32)
+    out[index] = pixels.reshape(-1, 4)[source]
+    depth = np.full(height * width, np.inf)
+    depth[index] = target[source, 2]
+    fillCracks(out.reshape(height, width, 4), depth.reshape(height, width))
+    return (out.ravel(), np.isinf(depth))
+
+def fillCracks(image, depth):
+    """Fills in place the empty pixels (infinite depth) that have filled
+    neighbours on at least two sides, with the nearest of them
+    """
+    height, width = depth.shape
+    padded = np.pad(depth, 1, constant_values=np.inf)
+    padded_image = np.pad(image, ((1, 1), (1, 1), (0, 0)))
+    best = np.full(depth.shape, np.inf)
+    color = np.zeros_like(image)
+    sides = np.zeros(depth.shape, dtype=np.int8)
+    for dy, dx in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+        rows = slice(1 + dy, 1 + dy + height)
+        cols = slice(1 + dx, 1 + dx + width)
+        near = padded[rows, cols]
+        sides += np.isfinite(near)
+        take = near < best
+        best[take] = near[take]
+        color[take] = padded_image[rows, cols][take]
+    fill = np.isinf(depth) & (sides >= 2)
+    image[fill] = color[fill]
+    depth[fill] = best[fill]
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ renderPasses ----------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def setScratchOutput(scene, file_format='OPEN_EXR_MULTILAYER'):
+    """Makes write_still renders go to a scratch folder as full float,
+    uncompressed EXR (depth needs it), returns the former settings
+    """
+    scratch = bpy.path.abspath(scene.eeveeMotionBlur_vars.scratch_dir) or None
+    workdir = tempfile.mkdtemp(prefix="emb_subframes_", dir=scratch)
+    settings = scene.render.image_settings
+    # the format goes first, the rest depends on it
+    orig_settings = {name : getattr(settings, name) for name in ('file_format', 'color_mode', 'color_depth', 'exr_codec')}
+    orig_output = (scene.render.filepath, orig_settings, workdir)
+    scene.render.filepath = os.path.join(workdir, "subframe_")
+    settings.file_format = file_format
+    settings.color_mode = 'RGBA'
+    settings.color_depth = '32'
+    settings.exr_codec = 'NONE'
+    return (orig_output)
 
-    return (rendertime) # {'FINISHED'}
+def restoreScratchOutput(scene, orig_output):
+    filepath, orig_settings, workdir = orig_output
+    scene.render.filepath = filepath
+    for name, value in orig_settings.items():
+        setattr(scene.render.image_settings, name, value)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+def renderPasses(frame, subfr, metrics):
+    """Renders a subframe to the multilayer output and reads all its
+    channels back, see setScratchOutput. Returns (channels, width, height)
+    """
+    scene = bpy.context.scene
+    start = time.perf_counter()
+    scene.frame_set(frame + floor(subfr), subframe=subfr - floor(subfr))
+    start = metrics.add('set_frame', start)
+    bpy.ops.render.render(write_still=True)
+    start = metrics.add('render', start)
+    
+    path = scene.render.frame_path(frame=scene.frame_current)
+    channels, width, height = readMultilayerEXR(path)
+    os.remove(path)
+    metrics.add('readback', start)
+    return (channels, width, height)
+
+def getPassPixels(channels, name, components):
+    """One pass of the channels as a (height, width, n) array, bottom row
+    first like the Viewer pixels. The composite if there is one, else the
+    first view layer that has the pass. None if no layer has it
+    """
+    layers = sorted({channel.rsplit(".", 2)[0] for channel in channels if channel.count(".") >= 2},
+        key=lambda layer: layer != 'Composite')
+    for layer in layers:
+        keys = [layer + "." + name + "." + c for c in components]
+        if (all(key in channels for key in keys)):
+            return (np.stack([channels[key] for key in keys], axis=-1)[::-1])
+    return (None)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# --------------------------- mbPassAccumulator --------------------------
+# ––––––––––––––––– combines render passes, each its own way –––––––––––––
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class mbPassAccumulator():
+    """Combines the channels of multilayer subframes
+
+    Colour and data passes are averaged with the subframe weights, depth
+    keeps the nearest surface and ID passes (object and material index,
+    cryptomatte, vectors) keep the first subframe, mixing IDs would make
+    up IDs that don't exist. Weights can be a number or one per row,
+    bottom row first like mbAccumulator's.
+    """
+    def __init__(self, double=False):
+        self.dtype = np.float64 if double else np.float32
+        self.channels = {}
+        self.rules = {}
+        self.weight = 0.0
+
+    @property
+    def nbytes(self):
+        return (sum(values.nbytes for values in self.channels.values()))
+
+    def add(self, channels, weight=1.0):
+        """Adds the channels of one subframe, {name: (height, width) array}"""
+        # EXR rows go top to bottom
+        row_weight = weight[::-1, None] if np.ndim(weight) else weight
+        for name, values in channels.items():
+            rule = self.rules.setdefault(name, getPassRule(name))
+            total = self.channels.get(name)
+            if (rule == 'MEAN'):
+                if (total is None):
+                    self.channels[name] = total = np.zeros(values.shape, dtype=self.dtype)
+                total += values * row_weight
+            elif (rule == 'MIN'):
+                if (total is None):
+                    self.channels[name] = values.copy()
+                else:
+                    np.minimum(total, values, out=total)
+            elif (total is None):
+                self.channels[name] = values
+        self.weight = self.weight + np.asarray(weight, dtype=np.float64)
+
+    def finish(self):
+        """Divides the averaged channels by the total weight, returns them as float32"""
+        weight = self.weight[::-1, None] if np.ndim(self.weight) else self.weight
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(weight > 0, 1.0 / weight, 0.0)
+        for name, values in self.channels.items():
+            if (self.rules[name] == 'MEAN'):
+                values *= scale
+                self.channels[name] = values.astype(np.float32, copy=False)
+        return (self.channels)
+
+def getPassRule(channel):
+    """How a channel like 'ViewLayer.Depth.Z' is combined through the
+    shutter: 'MEAN', 'MIN' for depth or 'FIRST' for ids
+    """
+    parts = channel.split(".")
+    name = parts[-2] if len(parts) > 1 else parts[0]
+    if (name in ('Depth', 'Z')):
+        return ('MIN')
+    if (name in ('IndexOB', 'IndexMA', 'Vector') or name.startswith('Crypto')):
+        return ('FIRST')
+    return ('MEAN')
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------- read / write multilayer ----------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def readMultilayerEXR(path):
+    """All the channels of an EXR as float32 (height, width) arrays, top
+    row first. Returns (channels, width, height)
+    """
+    exr = OpenEXR.InputFile(path)
+    try:
+        window = exr.header()['dataWindow']
+        width = window.max.x - window.min.x + 1
+        height = window.max.y - window.min.y + 1
+        pixel_type = Imath.PixelType(Imath.PixelType.FLOAT)
+        channels = {name : np.frombuffer(exr.channel(name, pixel_type), dtype=np.float32).reshape(height, width)
+            for name in exr.header()['channels']}
+    finally:
+        exr.close()
+    return (channels, width, height)
+
+def writeMultilayerEXR(path, channels, width, height):
+    """Writes float32 (height, width) channels, top row first, as one EXR"""
+    header = OpenEXR.Header(width, height)
+    channel = Imath.Channel(Imath.PixelType(Imath.PixelType.FLOAT))
+    header['channels'] = {name : channel for name in channels}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    exr = OpenEXR.OutputFile(tmp, header)
+    try:
+        exr.writePixels({name : np.ascontiguousarray(values, dtype=np.float32).tobytes()
+            for name, values in channels.items()})
+    finally:
+        exr.close()
+    os.replace(tmp, path)
 
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 # ---------------------------- render sequence  --------------------------
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 # fn render sequence
 def renderMB_sequence(startframe, endframe, context):
+    writer = None
+    failed = []
     try:
         # exec time
         startTime = datetime.now()
+        metrics = mbMetrics(context.scene)
 
         startframe = context.scene.frame_start
         endframe = context.scene.frame_end
         shutter_mult = context.scene.eevee.motion_blur_shutter
+        frames = list(range(startframe, endframe+1, context.scene.frame_step))
         
         # classic
         samples=context.scene.eevee.motion_blur_samples
-        formertime = False
-        for frame in range(startframe, endframe+1, context.scene.frame_step):
-            framerendertime = renderMBx1fr(frame, shutter_mult, samples, context)
-            # if not the first frame averages with former average
-            if (formertime) :
-                framerendertime = (formertime + framerendertime) / 2
-            formertime = framerendertime
-            print ("rendered frame "+ str(frame) + "/"+str(endframe))
-            print (str((endframe - frame)*framerendertime).split(".")[0] + " remaining ")
+        
+        # frames already rendered by an interrupted run are skipped
+        journal = mbJournal(context.scene)
+        if (context.scene.eeveeMotionBlur_vars.use_resume):
+            skipped = [frame for frame in frames if journal.isDone(frame)]
+            frames = [frame for frame in frames if frame not in skipped]
+            if (skipped):
+                metrics.log(LOG_NORMAL, "skipping %d frames already rendered", len(skipped))
+        
+        budgets = getFrameBudgets(context, frames, shutter_mult)
+        
+        # farm the frames out to background blender processes
+        if (context.scene.eeveeMotionBlur_vars.worker_count > 0):
+            results = renderMB_parallel(frames, context, journal, metrics)
+            metrics.log(LOG_NORMAL, "EMB Sequence Render completed in %s", datetime.now() - startTime)
+            metrics.summary(wall_seconds=(datetime.now() - startTime).total_seconds(),
+                failed=[frame for frame, result in results.items() if not result['ok']])
+            return (all(result['ok'] for result in results.values()))
+        
+        budget_total = sum(budgets.values())
+        budget_done = 0
+        # subframe times used by more than one frame are rendered once
+        pool = getSubframePool(context, frames, budgets, shutter_mult)
+        metrics.log(LOG_NORMAL, "rendering %d frames, %d subframes, %d shared", len(frames), budget_total, pool.shared())
+        
+        writer = getWriter(context)
+        saving = {}
+        failed = []
+        for frame in frames:
+            journal.mark(frame, 'rendering', path=getOutputPath(context.scene, frame))
+            info = {}
+            framerendertime = renderMBx1fr(frame, shutter_mult, samples, context, budget=budgets[frame], writer=writer, info=info, metrics=metrics, pool=pool)
+            if (framerendertime is False):
+                journal.mark(frame, 'failed', error=info.get('error'))
+                failed.append(frame)
+            elif (writer is not None and canSaveAsync(context.scene)):
+                # done once the writer has it on disk
+                saving[getOutputPath(context.scene, frame)] = frame
+                journal.mark(frame, 'saving', samples=info['samples'], seconds=framerendertime.total_seconds())
+            else:
+                journal.mark(frame, 'done', samples=info['samples'], seconds=framerendertime.total_seconds())
+            confirmWritten(writer, journal, saving)
             
+            budget_done += budgets[frame]
+            # remaining time from the exact number of subframes left
+            elapsed = datetime.now() - startTime
+            metrics.log(LOG_NORMAL, "rendered frame %d/%d", frame, endframe)
+            if (budget_done):
+                remaining = elapsed * ((budget_total - budget_done) / budget_done)
+                metrics.log(LOG_NORMAL, "%s remaining ", str(remaining).split(".")[0])
+        
+        # the sequence is done when the last image is on disk
+        closeWriter(writer, context.scene)
+        confirmWritten(writer, journal, saving)
+        
         # closing notice
-        print("EMB Sequence Render completed in " + str( datetime.now() - startTime)) 
+        if (failed):
+            metrics.log(LOG_QUIET, "FAILED frames: %s", failed)
+        metrics.log(LOG_NORMAL, "EMB Sequence Render completed in %s", datetime.now() - startTime)
+        if (writer is not None):
+            # encoded in the writer's threads, not part of any frame
+            metrics.totals['encode'] += writer.seconds
+        metrics.summary(wall_seconds=(datetime.now() - startTime).total_seconds(), failed=failed, reused=pool.hits)
     except KeyboardInterrupt:
-        print(' \n\nCANCELED')
+        embLog(context.scene, LOG_QUIET, " \n\nCANCELED")
+        closeWriter(writer, context.scene)
         raise
-    return
+    return (not failed)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ----------------------------- confirmWritten ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def confirmWritten(writer, journal, saving):
+    """Marks done the frames the background writer has saved"""
+    if (writer is None):
+        return
+    for path in writer.takeWritten():
+        # cached subframes go through the same writer
+        if (path in saving):
+            journal.mark(saving.pop(path), 'done')
+    for path, error in writer.errors:
+        if (path in saving):
+            journal.mark(saving.pop(path), 'failed', error=str(error))
 
-# adaptive sampling ::::::::::::::::::::::::::::::::::::::::::::::::::::::
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# ----------------------------- fn obBoxToCamera -------------------------
-# ------------------- convert bounding box to camera space ---------------
+# ------------------------- getWriter / closeWriter ----------------------
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# returns bounding box in camera space (0 –> 1)
-def obBoxToCamera(obj, context):
-    # print("\n\n2 . obBoxToCamera")
+def getWriter(context):
+    """Background writer for a sequence, or None to save in place"""
+    emb_vars = context.scene.eeveeMotionBlur_vars
+    if (emb_vars.use_async_save and canSaveAsync(context.scene)):
+        return (mbAsyncWriter(emb_vars.save_threads, emb_vars.save_threads))
+    return (None)
+
+def closeWriter(writer, scene):
+    if (writer is None):
+        return
+    embLog(scene, LOG_NORMAL, "waiting for images to be written")
+    for path, error in writer.close():
+        embLog(scene, LOG_QUIET, "could not save %s: %s", path, error)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- getFrameBudgets ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getFrameBudgets(context, frames, shutter_mult):
+    """Number of subframes each frame will render, {frame: samples}"""
+    emb_vars = context.scene.eeveeMotionBlur_vars
+    # adaptive: all the sample counts are known before rendering
+    # progressive: only the maximum is
+    if (emb_vars.use_progressive and not emb_vars.use_multilayer):
+        return ({frame : getProgressiveLimits(emb_vars)[1] for frame in frames})
+    elif (emb_vars.use_adaptive):
+        return (getSequenceBudgets(context, frames, shutter_mult))
+    return ({frame : ceil(context.scene.eevee.motion_blur_samples) for frame in frames})
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- getSubframePool ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getSubframePool(context, frames, budgets, shutter_mult):
+    """mbSubframePool that knows the subframes every frame will render"""
     scene = context.scene
-    bb_vertices = [Vector(v) for v in obj.bound_box]
-    mat = obj.matrix_world
-    world_bb_vertices = [mat @ v for v in bb_vertices]
+    emb_vars = scene.eeveeMotionBlur_vars
+    pool = mbSubframePool(emb_vars.shared_subframes)
+    # progressive times depend on the noise, passes don't use the Viewer,
+    # previews render at their own size, and reprojected, tiered and raw
+    # frames render their subframes without the pool
+    if (emb_vars.shared_subframes == 0 or emb_vars.use_progressive or emb_vars.use_multilayer or 
+        emb_vars.quality_preset != 'FINAL' or emb_vars.use_motion_tiers or emb_vars.use_raw_capture or 
+        (emb_vars.use_reprojection and OpenEXR is not None)):
+        return (pool)
+    height = getRenderPixels(scene)[1]
+    shutter_mult = min(MAX_SHUTTER, shutter_mult)
+    for frame in frames:
+        times, weights = getSubframeSchedule(budgets[frame], shutter_mult, emb_vars, height)
+        pool.plan(frame, times)
+    return (pool)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# --------------------------- getSequenceBudgets -------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getSequenceBudgets(context, frames, shutter_mult):
+    """Adaptive sample count of every frame, cached on the scene
 
-    co_2d = [world_to_camera_view(scene, scene.camera, v) for v in world_bb_vertices]  # from 0 to 1
+    The cache is keyed by a hash of the animation and the sampling
+    settings, so re-renders of an unchanged scene skip the analysis.
+    Only the frames missing from the cache are analysed.
+    """
+    emb_vars = context.scene.eeveeMotionBlur_vars
+    key = getAnimationHash(context, shutter_mult)
+    
+    try:
+        cache = json.loads(emb_vars.motion_cache)
+    except ValueError:
+        cache = {}
+    if (cache.get('hash') != key):
+        cache = {'hash' : key, 'samples' : {}}
+    budgets = {int(frame) : samples for frame, samples in cache['samples'].items()}
     
-    # devuelve una lista de las coordenadas 2D de los 8 vertices de la bounding box
-    return(co_2d)
+    missing = [frame for frame in frames if frame not in budgets]
+    if (not missing):
+        embLog(context.scene, LOG_NORMAL, "using cached motion analysis")
+    else:
+        deltas = motionPrepass(context, missing)
+        for frame in missing:
+            budgets[frame] = samplesFromDelta(deltas[frame], min(MAX_SHUTTER, shutter_mult), emb_vars)
+        emb_vars.motion_cache = json.dumps({'hash' : key, 'samples' : budgets})
+    return ({frame : budgets[frame] for frame in frames})
 
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# ------------------------ fn obBoxToCamera_2_verts ----------------------
-# ------------------- convert 2 opposing verts from the ------------------
-# ----------------------- bounding box to camera space -------------------
+# ---------------------------- renderMB_parallel -------------------------
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# returns bounding box in camera space (0 –> 1)
-#    ToDo
-def obBoxToCamera_2_verts(obj, context):
-    scene = context.scene
+def renderMB_parallel(frames, context, journal=None, metrics=None):
+    """Renders frames in background blender processes
 
-    bb_vertices = [Vector(v) for v in obj.bound_box]
-    bb_vertices = [bb_vertices[0] , bb_vertices[6] ]
- 
-    mat = obj.matrix_world
-    world_bb_vertices = [mat @ v for v in bb_vertices]
+    The scene is saved to a temporary copy and chunks of frames are handed
+    to free workers as they finish. Failed frames are retried. Returns a
+    dict {frame: report} with the status and render time of each frame.
+    The metrics the workers report are merged into metrics.
+    """
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    workers = emb_vars.worker_count
+    chunk = max(1, emb_vars.worker_chunk)
+    
+    # the copy takes the current state, cached motion analysis included
+    workdir = tempfile.mkdtemp(prefix="emb_")
+    blendfile = os.path.join(workdir, "emb_scene.blend")
+    bpy.ops.wm.save_as_mainfile(filepath=blendfile, copy=True)
+    output = bpy.path.abspath(scene.render.filepath)
+    # relative paths would point inside workdir in the copy
+    folders = {'subframe_cache_dir' : bpy.path.abspath(emb_vars.subframe_cache_dir), 
+        'scratch_dir' : bpy.path.abspath(emb_vars.scratch_dir)}
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    
+    pending = deque([frames[i:i+chunk] for i in range(0, len(frames), chunk)])
+    attempts = {}
+    results = {}
+    running = []
+    jobs = 0
+    try:
+        while (pending or running):
+            # hand out chunks to free workers
+            while (pending and len(running) < workers):
+                job_frames = pending.popleft()
+                report = os.path.join(workdir, "job_" + str(jobs) + ".json")
+                log = open(os.path.join(workdir, "job_" + str(jobs) + ".log"), 'w')
+                cmd = workerCommand(blendfile, scene.name, job_frames, output, report, threads, folders)
+                proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+                running.append((proc, job_frames, report, log))
+                embLog(scene, LOG_NORMAL, "worker %d rendering frames %s", proc.pid, job_frames)
+                jobs += 1
+            
+            time.sleep(0.2)
+            for job in list(running):
+                proc, job_frames, report, log = job
+                if (proc.poll() is None):
+                    continue
+                running.remove(job)
+                log.close()
+                done = readWorkerReport(report)
+                for frame in job_frames:
+                    if (done.get(frame, {}).get('ok')):
+                        results[frame] = done[frame]
+                        if (journal):
+                            journal.mark(frame, 'done', path=getOutputPath(scene, frame), 
+                                samples=done[frame]['samples'], seconds=done[frame]['seconds'])
+                        if (metrics is not None and done[frame].get('metrics')):
+                            metrics.merge(done[frame]['metrics'])
+                        embLog(scene, LOG_NORMAL, "rendered frame %d in %.1fs", frame, done[frame]['seconds'])
+                        continue
+                    attempts[frame] = attempts.get(frame, 0) + 1
+                    if (attempts[frame] <= emb_vars.worker_retries):
+                        embLog(scene, LOG_NORMAL, "frame %d failed, retrying", frame)
+                        pending.append([frame])
+                    else:
+                        embLog(scene, LOG_QUIET, "frame %d failed, see %s", frame, log.name)
+                        results[frame] = {'frame' : frame, 'ok' : False}
+                        if (journal):
+                            journal.mark(frame, 'failed', path=getOutputPath(scene, frame), error="see " + log.name)
+    except KeyboardInterrupt:
+        for proc, job_frames, report, log in running:
+            proc.kill()
+        raise
     
-    co_2d = [world_to_camera_view(scene, scene.camera, v) for v in world_bb_vertices]  # from 0 to 1
+    seconds = [r['seconds'] for r in results.values() if r['ok']]
+    failed = [frame for frame in frames if not results[frame]['ok']]
+    if (seconds):
+        embLog(scene, LOG_NORMAL, "average frame time %.1fs per worker", sum(seconds) / len(seconds))
+    if (failed):
+        embLog(scene, LOG_QUIET, "FAILED frames: %s", failed)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return (results)
 
-    return(co_2d)
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ workerCommand ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def workerCommand(blendfile, scene_name, frames, output, report, threads=0, folders=None):
+    """Command line of a background blender rendering frames with this addon.
+    folders: {setting: absolute path} for the folder settings
+    """
+    addon_dir = os.path.dirname(os.path.abspath(__file__))
+    module = __name__
+    expr = ("import sys; sys.path.insert(0, " + repr(addon_dir) + "); "
+        "import " + module + " as emb; sys.exit(emb.cliMain())")
+    return ([bpy.app.binary_path, "-b", blendfile, "-t", str(threads), 
+        "--python-exit-code", "1", "--python-expr", expr, "--", 
+        "--emb-scene", scene_name, 
+        "--emb-frames", ",".join(str(frame) for frame in frames), 
+        "--emb-output", output, 
+        "--emb-report", report] + 
+        [arg for name, path in (folders or {}).items() if path for arg in ("--emb-folder", name + "=" + path)])
 
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# ---------------------------- fn getObCameraDelta -----------------------
-# ------------------------ get object delta in camera --------------------
-# 
-# returns a list with the max delta
-# result must be in pixels not camera space
+# --------------------------------- cliMain ------------------------------
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-def getObCameraDelta(obj, context):
-    # print("\n\n3 . getObCameraDelta")
-    C = context
-    # print (C.scene.frame_current)
-    
-    #get next frame
-    C.scene.frame_set (C.scene.frame_current + 1)
-    # pasa 2 vertices del bounding box a camera space (beta)
-    ob_next = obBoxToCamera_2_verts(obj, context)
-    
-    #get cur frame
-    C.scene.frame_set (C.scene.frame_current - 1)
-
-    # pasa 2 vertices del bounding box a camera space (beta)
-    ob_current = obBoxToCamera_2_verts(obj, context)
-    
-    delta_a = get_2d_delta(ob_current[0], ob_next[0])
-    delta_b = get_2d_delta(ob_current[1], ob_next[1])
-    
-    return (max(delta_a,delta_b))
-
-# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# ------------------------------- get_2d_delta ---------------------------
-# ------------------------    calculate 2D deltas    ---------------------
-# 
-# gets input in cam space, result is in pixels
-# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# fn get_2d_delta
-# calculate 2D deltas 
-# gets input in cam space, result is in pixels
-def get_2d_delta(v1,v2):
-    v1 = camSpaceToPixels(v1)
-    v2 = camSpaceToPixels(v2)
-    # Pythagoras
-    c1 = ((v2[0]-v1[0]) ** 2 )
-    c2 = ((v2[1]-v1[1]) ** 2 )
-    return( int(math.sqrt(c1+c2)))
-# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# ----------------------------- fn isObInCamera --------------------------
-# --------- guess if obj is inside camera, return delta in pixels --------
-# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# guess if obj is inside camera, return delta in pixels
-def isObInCamera(obj, context):
-    # print("\n\n1. isObInCamera checking " + obj.name)
-    xs= [x[0] for x in obBoxToCamera(obj, context)]
-    ys= [x[1] for x in obBoxToCamera(obj, context)]
-    
-    # discriminate obs inside camera plane from the ones outside
-    if (min(xs) < 1 and min(ys) < 1):
-        if ((max(xs) > 0 ) and (max(ys) > 0)):
-            #print("\n\n" + obj.name + " is in camera!")
-            return (getObCameraDelta(obj, context))
-        else :
-            #print("\n\n" + obj.name + " is NOT in camera!")
-            return ([])
-    else :
-        #print("\n\n" + obj.name + " is NOT in camera!")
+CLI_USAGE = """
+blender -b shot.blend --python-exit-code 1 --python-expr "import sys; sys.path.insert(0, '/path/to/addon'); import eevee_motion_blur as emb; sys.exit(emb.cliMain())" -- [--emb-* options]
+
+Renders the active scene of the file, or the shots of a manifest, with
+the motion blur settings saved in the file and the overrides given.
+
+manifest, a JSON file:
+  {"report": "/farm/job/report.jsonl",
+   "shots": [{"name": "sh010", "blend": "/proj/sh010.blend", "scene": "Scene",
+              "frames": "1-48", "chunk": 12, "samples": 16, "shutter": 0.5,
+              "output": "/renders/sh010/", "settings": {"use_regions": true}}]}
+  Every key but blend is optional. Shots are split in chunks of frames,
+  --emb-chunk picks one so a farm can submit each as its own task. The
+  settings are eeveeMotionBlur_vars properties.
+
+report: one JSON line per frame with the shot, frame, ok, samples,
+  seconds, output path, error and stage metrics.
+
+exit codes: 0 all frames rendered, 1 some frames failed, 2 bad arguments,
+  manifest, blend file or scene.
+"""
+
+def getCommandLineParser():
+    parser = argparse.ArgumentParser(prog="eevee_motion_blur", usage=CLI_USAGE, 
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emb-scene", default=None, 
+        help="scene the frames belong to, it must be the active scene of the file")
+    parser.add_argument("--emb-frames", default=None, 
+        help="frames like 1-24,30,40-60:2, the scene frame range if not given")
+    parser.add_argument("--emb-samples", type=int, default=None, 
+        help="fixed number of subframes, turns adaptive and progressive sampling off")
+    parser.add_argument("--emb-max-samples", type=int, default=None, 
+        help="most subframes adaptive and progressive sampling may use")
+    parser.add_argument("--emb-shutter", type=float, default=None, 
+        help="shutter length in frames")
+    parser.add_argument("--emb-output", default=None, help="output path, like the render filepath")
+    parser.add_argument("--emb-folder", action='append', default=[], metavar="SETTING=PATH", 
+        help="folder setting like subframe_cache_dir or scratch_dir, can be repeated")
+    parser.add_argument("--emb-report", default=None, help="JSON lines file the frames are reported to")
+    parser.add_argument("--emb-manifest", default=None, help="JSON file with the shots to render")
+    parser.add_argument("--emb-chunk", type=int, default=None, 
+        help="render only this chunk of the manifest, counting from 0")
+    return (parser)
+
+def cliMain(argv=None):
+    """Command line entry point, returns the exit code, see CLI_USAGE
+
+    Used by the parallel workers too. Takes the arguments after '--'.
+    """
+    argv = sys.argv if argv is None else argv
+    argv = argv[argv.index("--") + 1:] if "--" in argv else []
+    args = getCommandLineParser().parse_args(argv)
+    
+    # the addon may not be enabled in the blender preferences
+    if (not hasattr(bpy.types.Scene, "eeveeMotionBlur_vars")):
+        register()
+    
+    overrides = {'scene' : args.emb_scene, 'frames' : args.emb_frames, 'samples' : args.emb_samples, 
+        'max_samples' : args.emb_max_samples, 'shutter' : args.emb_shutter, 'output' : args.emb_output}
+    overrides = {key : value for key, value in overrides.items() if value is not None}
+    folders = {}
+    for folder in args.emb_folder:
+        name, sep, path = folder.partition("=")
+        if (not sep or name not in ('subframe_cache_dir', 'scratch_dir')):
+            print ("bad folder setting " + folder)
+            return (2)
+        folders[name] = path
+    report = args.emb_report
+    if (args.emb_manifest):
+        try:
+            with open(args.emb_manifest) as f:
+                manifest = json.load(f)
+            jobs = getManifestJobs(manifest)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print ("could not read the manifest " + args.emb_manifest + ": " + str(e))
+            return (2)
+        report = report or manifest.get('report')
+        # the command line wins over the manifest
+        jobs = [dict(job, **overrides) for job in jobs]
+    else:
+        jobs = [overrides]
+    jobs = [dict(job, settings=dict(job.get('settings', {}), **folders)) for job in jobs]
+    
+    if (args.emb_chunk is not None):
+        if (not 0 <= args.emb_chunk < len(jobs)):
+            print ("there are %d chunks, %d does not exist" % (len(jobs), args.emb_chunk))
+            return (2)
+        jobs = [jobs[args.emb_chunk]]
+    
+    code = 0
+    for job in jobs:
+        code = max(code, renderJob(job, report))
+    return (code)
+
+def getManifestJobs(manifest):
+    """Every shot of a manifest split in its chunks of frames, one dict each"""
+    jobs = []
+    for shot in manifest['shots']:
+        if (not isinstance(shot.get('blend'), str)):
+            raise ValueError("every shot needs a blend file")
+        frames = parseFrames(str(shot['frames'])) if 'frames' in shot else None
+        chunk = shot.get('chunk')
+        if (frames is None or not chunk):
+            jobs.append(shot)
+            continue
+        for i in range(0, len(frames), chunk):
+            jobs.append(dict(shot, frames=",".join(str(frame) for frame in frames[i:i+chunk])))
+    return (jobs)
+
+def parseFrames(text):
+    """Frame numbers from a list like 1-24,30,40-60:2"""
+    frames = []
+    for part in text.split(","):
+        part, step = part.split(":") if ":" in part else (part, 1)
+        # negative frames are allowed: -5--1
+        bounds = re.match(r"^\s*(-?\d+)\s*(?:-\s*(-?\d+))?\s*$", part)
+        if (bounds is None or int(step) < 1):
+            raise ValueError("bad frames: " + part)
+        first = int(bounds.group(1))
+        last = int(bounds.group(2)) if bounds.group(2) is not None else first
+        frames.extend(range(first, last + 1, int(step)))
+    return (frames)
+
+def renderJob(job, report=None):
+    """Renders the frames of one job, opening its blend file if it has one.
+    Returns the exit code
+    """
+    tags = {key : job[key] for key in ('name', 'blend') if key in job}
+    try:
+        if (job.get('blend') and os.path.abspath(job['blend']) != os.path.abspath(bpy.data.filepath)):
+            bpy.ops.wm.open_mainfile(filepath=job['blend'])
+        scene = bpy.context.scene
+        # renders always use the active scene of the file
+        if (job.get('scene') and job['scene'] != scene.name):
+            raise ValueError("scene " + job['scene'] + " is not the active scene of the file")
+        applyJobSettings(scene, job)
+        frames = parseFrames(str(job['frames'])) if job.get('frames') else \
+            list(range(scene.frame_start, scene.frame_end + 1, scene.frame_step))
+    except Exception as e:
+        print ("could not set up " + str(job.get('name') or job.get('blend') or "the job") + ": " + str(e))
+        if (report):
+            writeReport(report, dict(tags, frame=None, ok=False, error=str(e)))
+        return (2)
+    try:
+        failed = renderFrames(bpy.context, frames, report, tags)
+    except Exception as e:
+        traceback.print_exc()
+        if (report):
+            writeReport(report, dict(tags, frame=None, ok=False, error=str(e)))
+        return (1)
+    return (1 if failed else 0)
+
+def applyJobSettings(scene, job):
+    """Puts the overrides of a job on the scene"""
+    emb_vars = scene.eeveeMotionBlur_vars
+    for name, value in job.get('settings', {}).items():
+        if (not hasattr(emb_vars, name)):
+            raise ValueError("unknown setting " + name)
+        setattr(emb_vars, name, value)
+    if (job.get('samples') is not None):
+        scene.eevee.motion_blur_samples = job['samples']
+        emb_vars.use_adaptive = False
+        emb_vars.use_progressive = False
+    if (job.get('max_samples') is not None):
+        emb_vars.max_samples = job['max_samples']
+    if (job.get('shutter') is not None):
+        scene.eevee.motion_blur_shutter = job['shutter']
+    if (job.get('output')):
+        scene.render.filepath = job['output']
+
+def renderFrames(context, frames, report=None, tags=None):
+    """Renders frames one by one, reporting each to the report file as a
+    JSON line with tags added, once its image is on disk. Returns the
+    number of frames that failed
+    """
+    scene = context.scene
+    shutter_mult = scene.eevee.motion_blur_shutter
+    samples = scene.eevee.motion_blur_samples
+    budgets = getFrameBudgets(context, frames, shutter_mult)
+    
+    writer = getWriter(context)
+    metrics = mbMetrics(scene)
+    failed = 0
+    # entries of the frames the writer is still saving, by path
+    saving = {}
+    try:
+        for frame in frames:
+            info = {}
+            rendertime = renderMBx1fr(frame, shutter_mult, samples, context, budget=budgets[frame], writer=writer, info=info, metrics=metrics)
+            ok = rendertime is not False
+            entry = dict(tags or {}, frame=frame, ok=ok, 
+                samples=info.get('samples'), error=info.get('error'), 
+                seconds=rendertime.total_seconds() if ok else None, 
+                path=getOutputPath(scene, frame), metrics=info.get('metrics'))
+            if (ok and writer is not None and canSaveAsync(scene)):
+                saving[entry['path']] = entry
+                entries = []
+            else:
+                entries = [entry]
+            failed += reportFrames(report, entries + takeSaved(writer, saving))
+    finally:
+        closeWriter(writer, scene)
+    # the writer is closed, whatever it did not confirm was not saved
+    entries = takeSaved(writer, saving)
+    entries += [dict(entry, ok=False, error="not saved") for entry in saving.values()]
+    failed += reportFrames(report, entries)
+    return (failed)
+
+def takeSaved(writer, saving):
+    """Entries of the frames the writer has saved or failed to save since
+    the last call, taken out of saving
+    """
+    if (writer is None):
         return ([])
+    entries = []
+    for path in writer.takeWritten():
+        # cached subframes go through the same writer
+        if (path in saving):
+            entries.append(saving.pop(path))
+    for path, error in writer.errors:
+        if (path in saving):
+            entries.append(dict(saving.pop(path), ok=False, error=str(error)))
+    return (entries)
+
+def reportFrames(report, entries):
+    """Writes the entries to the report, returns how many failed"""
+    if (report):
+        for entry in entries:
+            writeReport(report, entry)
+    return (len([entry for entry in entries if not entry['ok']]))
+
+def writeReport(path, entry):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as report:
+        report.write(json.dumps(entry) + "\n")
 
-    return
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
-# ----------------------------- fn camSpaceToPixels ----------------------
-# ----------- converts cam space to pixels, input is a list [x,y] --------
+# --------------------------- readWorkerReport ---------------------------
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def readWorkerReport(path):
+    """Frames reported by a worker, {frame: report}"""
+    done = {}
+    if (not os.path.exists(path)):
+        return (done)
+    with open(path) as report:
+        for line in report:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # a worker killed while writing
+                continue
+            done[entry['frame']] = entry
+    return (done)
 
-def camSpaceToPixels(pos):
-    scene = bpy.context.scene
-    render_scale = scene.render.resolution_percentage / 100
-    render_size = list(int(res) * render_scale for res in [scene.render.resolution_x, scene.render.resolution_y])
-    pixel_coords = arr.array('f')
-    pix_x = pos[0] * render_size[0]
-    pix_y = pos[1] * render_size[1]
+# adaptive sampling ::::::::::::::::::::::::::::::::::::::::::::::::::::::
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# --------------------------- fn getMotionObjects ------------------------
+# ---------------- objects that are checked for motion -------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getMotionObjects(context):
+    # object types to check for motion
+    ## types = ['MESH', 'ARMATURE']
+    return ([obj for obj in context.scene.objects 
+        if ((obj.hide_render == False) and (obj.type == 'MESH'))])
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ mbProjection ----------------------------
+# ––––––– the scene camera and render size at one scene evaluation –––––––
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+class mbProjection():
+    """Projects world points with the scene camera as it is now
+
+    The render size, world –> camera matrix, view frame and frustum planes
+    are read from the scene once, then points are projected in batches of
+    (..., 4) arrays. project() gives the x, y (0 –> 1) and depth of
+    world_to_camera_view. Evaluating the scene at another time needs a new
+    one.
+    """
+    def __init__(self, scene):
+        cam = scene.camera
+        self.view = np.array(cam.matrix_world.normalized().inverted())
+        self.to_world = np.linalg.inv(self.view)
+        frame = cam.data.view_frame(scene=scene)
+        # (min_x, max_x, min_y, max_y) of the view frame and its distance
+        self.bounds = (frame[2].x, frame[1].x, frame[1].y, frame[0].y)
+        self.plane = -frame[0].z
+        self.ortho = cam.data.type == 'ORTHO'
+        self.render_size = getRenderSize(scene)
+        
+        # frustum planes on (x, y, depth, 1), inside where all are >= 0.
+        # Linear in depth, so they hold behind the camera too
+        min_x, max_x, min_y, max_y = self.bounds
+        if (self.ortho):
+            sides = [(1, 0, 0, -min_x), (-1, 0, 0, max_x), (0, 1, 0, -min_y), (0, -1, 0, max_y)]
+        else:
+            p = self.plane
+            sides = [(p, 0, -min_x, 0), (-p, 0, max_x, 0), (0, p, -min_y, 0), (0, -p, max_y, 0)]
+        self.planes = np.array(sides + [(0, 0, 1, -cam.data.clip_start), (0, 0, -1, cam.data.clip_end)])
+
+    def same(self, other):
+        """True if both see the scene through the same camera and frame"""
+        return (np.allclose(self.view, other.view) and self.bounds == other.bounds and 
+            self.plane == other.plane and self.ortho == other.ortho)
+
+    def toCamera(self, coords):
+        """World coords to camera space: x, y, depth (positive in front), 1"""
+        co = coords @ self.view.T
+        co[..., 2] *= -1.0
+        return (co)
+
+    def toFrame(self, co):
+        """Camera space to x, y in the frame (0 –> 1) and depth, (..., 3)"""
+        min_x, max_x, min_y, max_y = self.bounds
+        z = co[..., 2]
+        if (not self.ortho):
+            # same as scaling the frame to the depth of each point
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scale = np.where(z != 0.0, self.plane / z, 0.0)
+        else:
+            scale = 1.0
+        
+        co_2d = np.empty(co.shape[:-1] + (3,))
+        co_2d[..., 0] = (co[..., 0] * scale - min_x) / (max_x - min_x)
+        co_2d[..., 1] = (co[..., 1] * scale - min_y) / (max_y - min_y)
+        co_2d[..., 2] = z
+        if (not self.ortho):
+            # world_to_camera_view puts points on the camera plane at the center
+            co_2d[z == 0.0, :2] = 0.5
+        return (co_2d)
+
+    def project(self, coords):
+        """World coords to x, y in the frame (0 –> 1) and depth"""
+        return (self.toFrame(self.toCamera(coords)))
+
+    def toPixels(self, co_2d):
+        """Frame coords (0 –> 1) to pixels"""
+        return (co_2d[..., :2] * self.render_size)
+
+    def inFrustum(self, co, offsets):
+        """Objects that may be seen, from their points in camera space one
+        object after the other, starting at offsets. An object is culled
+        when all its points are outside the same plane of the frustum:
+        beside the frame, behind the camera or past the clipping
+        """
+        if (not len(offsets)):
+            return (np.zeros(0, dtype=bool))
+        distance = co @ self.planes.T
+        outside = np.maximum.reduceat(distance, offsets, axis=0) < 0
+        return (~outside.any(axis=1))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- fn unprojectPixels ------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# world coords (height * width, 4) of the center of every pixel, bottom
+# row first, from a (height, width) depth pass seen through an mbProjection
+def unprojectPixels(depth, camera):
+    (min_x, max_x, min_y, max_y), plane = camera.bounds, camera.plane
+    height, width = depth.shape
+    u = (np.arange(width) + 0.5) / width * (max_x - min_x) + min_x
+    v = (np.arange(height) + 0.5) / height * (max_y - min_y) + min_y
+    co = np.ones((height, width, 4))
+    co[..., 0] = u[None, :]
+    co[..., 1] = v[:, None]
+    if (not camera.ortho):
+        co[..., :2] *= (depth / plane)[..., None]
+    co[..., 2] = -depth
+    return (co.reshape(-1, 4) @ camera.to_world.T)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- fn getObjectPoints ------------------------
+# -------- points of each object that are followed to measure motion -----
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# returns (points, 4) local coords. With geometry == 'VERTICES' a decimated
+# subset of the evaluated mesh, at most max_verts and always the same ones
+# for a given vertex count, else the 8 corners of the bounding box
+def getObjectPoints(obj, depsgraph, geometry, max_verts):
+    if (geometry == 'VERTICES'):
+        ob_eval = obj.evaluated_get(depsgraph)
+        mesh = ob_eval.to_mesh()
+        count = len(mesh.vertices)
+        if (count):
+            co = np.empty(count * 3, dtype=np.float32)
+            mesh.vertices.foreach_get('co', co)
+            ob_eval.to_mesh_clear()
+            index = np.linspace(0, count - 1, min(count, max_verts)).astype(int)
+            points = np.ones((len(index), 4))
+            points[:, :3] = co.reshape(-1, 3)[index]
+            return (points)
+        ob_eval.to_mesh_clear()
+    points = np.ones((8, 4))
+    points[:, :3] = obj.bound_box
+    return (points)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- fn getMotionSnapshot ----------------------
+# --------- evaluate the scene once and project all objects' points ------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# returns a (points, 3) array in camera space (0 –> 1) with the points of
+# all objects one after the other, the index where each object starts, the
+# mbProjection they were projected with and which objects are in its frustum
+# boxes: indices of the objects measured by their bounding box whatever
+# the geometry, see getMotionPath
+def getMotionSnapshot(context, objects, frame, subframe=0.0, geometry='BOX', max_verts=256, boxes=()):
+    scene = context.scene
+    scene.frame_set(frame, subframe=subframe)
+    projection = mbProjection(scene)
+    
+    if (geometry == 'BOX'):
+        # bounding boxes and matrices of every object, batched
+        corners = np.ones((len(objects), 8, 4))
+        matrices = np.empty((len(objects), 4, 4))
+        for n, obj in enumerate(objects):
+            corners[n, :, :3] = obj.bound_box
+            matrices[n] = obj.matrix_world
+        
+        # local –> world for all corners at once
+        world = np.einsum('nij,nkj->nki', matrices, corners)
+        offsets = np.arange(len(objects)) * 8
+        co = projection.toCamera(world.reshape(-1, 4))
+        return (projection.toFrame(co), offsets, projection, projection.inFrustum(co, offsets))
+    
+    depsgraph = context.evaluated_depsgraph_get()
+    world = []
+    for n, obj in enumerate(objects):
+        points = getObjectPoints(obj, depsgraph, 'BOX' if n in boxes else geometry, max_verts)
+        world.append(points @ np.array(obj.matrix_world).T)
+    
+    lengths = [len(points) for points in world]
+    offsets = np.cumsum([0] + lengths[:-1])
+    if (not world):
+        return (np.empty((0, 3)), offsets, projection, np.zeros(0, dtype=bool))
+    co = projection.toCamera(np.concatenate(world))
+    return (projection.toFrame(co), offsets, projection, projection.inFrustum(co, offsets))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- fn getMotionTimes -------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# times at which the scene is evaluated to measure the motion of a frame
+def getMotionTimes(frame, shutter_mult, emb_vars):
+    if (emb_vars.analysis_mode == 'SUBFRAMES'):
+        steps = max(1, emb_vars.analysis_steps)
+        shutter_mult = min(MAX_SHUTTER, shutter_mult)
+        offset = getShutterOffset(shutter_mult, emb_vars)
+        return ([frame + offset + shutter_mult * k / steps for k in range(steps + 1)])
+    # frame N and N+1
+    return ([frame, frame + 1])
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ----------------------------- fn getMotionPath -------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# one snapshot per time, known: {time: snapshot} already evaluated
+# every snapshot of a path has the same layout: the objects whose vertex
+# count changes along it are measured by their bounding box all along
+def getMotionPath(context, objects, times, emb_vars, known=None):
+    known = known or {}
+    boxes = set()
+    while (True):
+        path = []
+        changed = set()
+        for time in times:
+            if (time in known and not boxes):
+                snapshot = known[time]
+            else:
+                frame = floor(time)
+                snapshot = getMotionSnapshot(context, objects, frame, time - frame,
+                    emb_vars.analysis_geometry, emb_vars.analysis_max_verts, boxes)
+            counts = np.diff(np.append(snapshot[1], len(snapshot[0])))
+            if (path):
+                changed = set(np.flatnonzero(counts != first).tolist())
+                if (changed):
+                    break
+            else:
+                first = counts
+            path.append(snapshot)
+        if (not changed):
+            return (path)
+        # start over, each pass boxes at least one more object
+        boxes |= changed
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- fn getObjectDeltas ------------------------
+# ---------- per object motion in pixels/frame around one frame ----------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# returns a dict {object name: delta in px} for the objects in camera
+def getObjectDeltas(context, frame):
+    objects = getMotionObjects(context)
+    if (not objects):
+        return ({})
+    
+    # a few scene evaluations no matter how many objects
+    emb_vars = context.scene.eeveeMotionBlur_vars
+    times = getMotionTimes(frame, context.scene.eevee.motion_blur_shutter, emb_vars)
+    path = getMotionPath(context, objects, times, emb_vars)
+    
+    return (pathDeltas(context, objects, path, times))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ------------------------------ fn pathDeltas ---------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# per object deltas in px/frame along a path of snapshots, for the objects
+# in camera. The delta of each point is the length of the polyline it
+# follows on screen, so rotation and curved paths are fully measured
+def pathDeltas(context, objects, path, times):
+    if (not objects):
+        return ({})
+    arc = np.zeros(len(path[0][0]))
+    in_camera = np.zeros(len(objects), dtype=bool)
+    for k, (co_2d, offsets, projection, visible) in enumerate(path):
+        # discriminate obs inside the camera frustum from the ones outside
+        in_camera |= visible
+        if (k):
+            delta_px = projection.toPixels(co_2d - path[k - 1][0])
+            arc += np.sqrt((delta_px ** 2).sum(axis=-1))
+    
+    # largest path of each object, as motion per frame
+    deltas = np.maximum.reduceat(arc, offsets) / max(times[-1] - times[0], 1e-6)
+    
+    return ({obj.name : float(deltas[n]) for n, obj in enumerate(objects) if in_camera[n]})
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- fn getMovingRegion ------------------------
+# ------- screen rectangle covering everything that moves in a frame -----
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# returns (x0, y0, x1, y1) in pixels, or None when the whole frame has to
+# be rendered: the camera moves or the moving region is too big to pay off.
+# objects: the ones to cover, all of them if None
+def getMovingRegion(context, frame, subframes, objects=None):
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    if (objects is None):
+        objects = getMotionObjects(context)
+    times = [frame + subfr for subfr in subframes]
+    path = getMotionPath(context, objects, times, emb_vars)
+    scene.frame_set(frame)
+    
+    # a moving camera moves every pixel, background included
+    if (any(not snapshot[2].same(path[0][2]) for snapshot in path)):
+        embLog(scene, LOG_NORMAL, "camera moves, rendering full frames")
+        return (None)
+    if (not objects):
+        return (None)
     
-    return([pix_x, pix_y])
+    offsets = path[0][1]
+    points = np.stack([snapshot[0] for snapshot in path])
+    pixels = path[0][2].toPixels(points)
+    
+    # objects with any point moving more than half a pixel
+    moved = np.abs(pixels - pixels[0]).max(axis=(0, 2)) > 0.5
+    moving = np.maximum.reduceat(moved.astype(np.int8), offsets) > 0
+    use = np.repeat(moving, np.diff(np.append(offsets, len(moved))))
+    if (not use.any()):
+        embLog(scene, LOG_NORMAL, "nothing moves, rendering the base frame only")
+        return ((0, 0, 0, 0))
+    if (not (points[:, use, 2] > 0).all()):
+        # a moving object crosses the camera plane, its rectangle is unknown
+        return (None)
+    
+    # union of the rectangles of all moving objects through the shutter
+    pad = emb_vars.region_padding
+    width, height = getRenderPixels(scene)
+    used = pixels[:, use]
+    x0 = max(0, int(floor(used[..., 0].min() - pad)))
+    y0 = max(0, int(floor(used[..., 1].min() - pad)))
+    x1 = min(width, int(ceil(used[..., 0].max() + pad)))
+    y1 = min(height, int(ceil(used[..., 1].max() + pad)))
+    if (x1 <= x0 or y1 <= y0):
+        # moving objects are all off screen
+        return ((0, 0, 0, 0))
+    
+    coverage = ((x1 - x0) * (y1 - y0)) / (width * height)
+    if (coverage > emb_vars.region_max_coverage):
+        embLog(scene, LOG_NORMAL, "moving region covers %d%% of the frame, rendering full frames", coverage * 100)
+        return (None)
+    embLog(scene, LOG_NORMAL, "rendering moving region %s, %d%% of the frame", (x0, y0, x1, y1), coverage * 100)
+    return ((x0, y0, x1, y1))
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# -------------------------- fn getCameraOnlyMotion ----------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# returns the mbProjection of every subframe when the camera is the only
+# thing that moves, None when an object moves too (or nothing moves at all)
+def getCameraOnlyMotion(context, frame, subframes):
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    objects = getMotionObjects(context)
+    first = None
+    cameras = []
+    try:
+        for subfr in subframes:
+            scene.frame_set(frame + floor(subfr), subframe=subfr - floor(subfr))
+            # world transforms, and the evaluated vertices to catch deformation
+            state = [np.array(obj.matrix_world) for obj in objects]
+            if (emb_vars.analysis_geometry == 'VERTICES'):
+                depsgraph = context.evaluated_depsgraph_get()
+                state += [getObjectPoints(obj, depsgraph, 'VERTICES', emb_vars.analysis_max_verts) for obj in objects]
+            if (first is None):
+                first = state
+            elif (any(a.shape != b.shape or not np.allclose(a, b) for a, b in zip(first, state))):
+                return (None)
+            cameras.append(mbProjection(scene))
+    finally:
+        scene.frame_set(frame)
+
+    if (all(camera.same(cameras[0]) for camera in cameras)):
+        return (None)
+    return (cameras)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ----------------------------- fn getRenderSize -------------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def getRenderSize(scene):
+    render_scale = scene.render.resolution_percentage / 100
+    return (np.array([scene.render.resolution_x * render_scale, 
+        scene.render.resolution_y * render_scale]))
+
+# width and height of the rendered images, blender floors the scaled size
+def getRenderPixels(scene):
+    render = scene.render
+    return ((render.resolution_x * render.resolution_percentage // 100, 
+        render.resolution_y * render.resolution_percentage // 100))
 
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 # ----------------------------- fn getMaxDelta ---------------------------
-# -------------- loops through all objects in scene, guesses  ------------
+# -------------- projects all objects in scene, guesses  -----------------
 # ---------- which are in camera view and returns the max delta ---------- 
 # ------------  meaning maximum speed in pixels/frame found --------------
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
 
 # check all objs in scene
-def getMaxDelta(context):    
+def getMaxDelta(context, frame=None):    
     C = context
-    mydeltas = [0]
+    if (frame is None):
+        frame = C.scene.frame_current
     
-    # object types to check for motion
-    ## types = ['MESH', 'ARMATURE']
-
-    for obj in C.scene.objects:
-        if ((obj.hide_render == False) and (obj.type == 'MESH') ):
-            
-            delta = isObInCamera(obj, C)
-            try:
-                if (delta):
-                    # print("–––––––––––––––––––– " + obj.type)
-                    print("• " + obj.name + " is in camera moving at " + str(delta) + "px per frame")
-                    mydeltas.append(delta)
-            except:
-                print ("except")
-                pass
-    print('search ended') 
-    maxd = abs(max(mydeltas))
-    print("max total frame delta is "+ str(maxd) + "px")
-    print("film exposed movement is " + str(maxd * (min(1, context.scene.eevee.motion_blur_shutter))) + "px")
+    mydeltas = getObjectDeltas(C, frame)
+    C.scene.frame_set(frame)
+    # one line per object floods the console on big scenes, verbose only
+    if (LOG_LEVELS.get(C.scene.eeveeMotionBlur_vars.verbosity) >= LOG_VERBOSE):
+        for name, delta in mydeltas.items():
+            if (delta):
+                print("• " + name + " is in camera moving at " + str(int(delta)) + "px per frame")
+    maxd = max(mydeltas.values(), default=0)
+    embLog(C.scene, LOG_NORMAL, "max total frame delta is %dpx", maxd)
+    embLog(C.scene, LOG_VERBOSE, "film exposed movement is %spx", maxd * (min(MAX_SHUTTER, context.scene.eevee.motion_blur_shutter)))
     if (maxd == 0):
-        print ("no movement found")
+        embLog(C.scene, LOG_NORMAL, "no movement found")
+        
+    return(maxd)
+
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ----------------------------- fn getMotionTiers ------------------------
+# ---------- groups the objects in camera by the samples they need -------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# returns [(object names, samples, region)], slowest tier first, which also
+# holds everything not listed (static objects, objects out of camera, the
+# world). Tiers double their samples over the background samples. Faster
+# tiers are rendered only in the region their objects cross (None for the
+# whole frame). None if every object fits in the background tier, or if
+# the tiers would render more than the frame does without them
+def getMotionTiers(context, frame, shutter_mult):
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    deltas = getObjectDeltas(context, frame)
+    context.scene.frame_set(frame)
+    base = max(emb_vars.tier_samples, 1)
+
+    levels = {}
+    for name, delta in deltas.items():
+        samples = samplesFromDelta(delta, shutter_mult, emb_vars)
+        level = 0 if samples <= base else ceil(log2(samples / base))
+        levels.setdefault(level, []).append((name, samples))
+    if (not any(level > 0 for level in levels)):
+        return (None)
+
+    slow = levels.pop(0, [])
+    tiers = [({name for name, samples in slow}, max([samples for name, samples in slow] + [max(emb_vars.min_samples, 1)]))]
+    for level in sorted(levels):
+        tiers.append(({name for name, samples in levels[level]}, max(samples for name, samples in levels[level])))
+    
+    # cost in full frame renders, holdouts are rendered too so a region
+    # costs its share of the frame
+    objects = {obj.name : obj for obj in getMotionObjects(context)}
+    width, height = getRenderPixels(scene)
+    plain = len(getSubframeSchedule(max(samples for names, samples in tiers), shutter_mult, emb_vars, height)[0])
+    cost = len(getSubframeSchedule(tiers[0][1], shutter_mult, emb_vars, height)[0])
+    regions = [None]
+    for names, samples in tiers[1:]:
+        times = getSubframeSchedule(samples, shutter_mult, emb_vars, height)[0]
+        region = getMovingRegion(context, frame, times, [objects[name] for name in sorted(names)])
+        regions.append(region)
+        area = 1.0 if region is None else max(0, region[2] - region[0]) * max(0, region[3] - region[1]) / (width * height)
+        cost += len(times) * area
+    if (cost >= plain):
+        embLog(scene, LOG_NORMAL, "motion tiers would take %.1f renders instead of %d, rendering the frame whole", cost, plain)
+        return (None)
+    return ([(names, samples, region) for (names, samples), region in zip(tiers, regions)])
 
-    # print ("mydeltas: " + str(mydeltas))
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ----------------------------- fn motionPrepass -------------------------
+# ---------- max delta of every frame, evaluating each frame once --------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+def motionPrepass(context, frames):
+    objects = getMotionObjects(context)
+    emb_vars = context.scene.eeveeMotionBlur_vars
+    shutter_mult = context.scene.eevee.motion_blur_shutter
+    orig_frame = context.scene.frame_current
+    maxdeltas = {}
+    
+    known = {}
+    for frame in frames:
+        times = getMotionTimes(frame, shutter_mult, emb_vars)
+        path = getMotionPath(context, objects, times, emb_vars, known)
+        # the last snapshot of a frame may be the first of the next one
+        known = {times[-1] : path[-1]}
         
-    return(abs(max(mydeltas)))
+        deltas = pathDeltas(context, objects, path, times)
+        maxdeltas[frame] = max(deltas.values(), default=0)
+        embLog(context.scene, LOG_VERBOSE, "frame %d max delta is %dpx", frame, maxdeltas[frame])
+    
+    context.scene.frame_set(orig_frame)
+    return (maxdeltas)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# -------------------------- fn getAnimationSources ----------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# every datablock whose animation can move the objects: the objects, their
+# parents, constraint and modifier targets (armatures, hooks, curves...),
+# their data (camera lens, armature) and shape keys, followed recursively.
+# In a stable order, each once
+def getAnimationSources(objects):
+    sources = []
+    seen = set()
+    pending = list(objects)
+    while (pending):
+        datablock = pending.pop(0)
+        if (datablock is None or datablock.as_pointer() in seen):
+            continue
+        seen.add(datablock.as_pointer())
+        sources.append(datablock)
+        if (datablock.bl_rna.identifier != 'Object'):
+            continue
+        pending.append(datablock.parent)
+        for con in getattr(datablock, 'constraints', []):
+            pending.append(getattr(con, 'target', None))
+            pending += [target.target for target in getattr(con, 'targets', [])]
+        for mod in datablock.modifiers:
+            pending += [getattr(mod, name, None) for name in ('object', 'target', 'offset_object')]
+        data = datablock.data
+        if (data is not None):
+            pending.append(data)
+            pending.append(getattr(data, 'shape_keys', None))
+    return (sources)
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# ---------------------------- fn getAnimationHash -----------------------
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+# hash of everything the adaptive sample counts depend on
+def getAnimationHash(context, shutter_mult):
+    scene = context.scene
+    emb_vars = scene.eeveeMotionBlur_vars
+    h = hashlib.sha1()
+    h.update(repr((shutter_mult, emb_vars.pixel_tolerance, 
+        emb_vars.min_samples, emb_vars.max_samples, emb_vars.analysis_mode, emb_vars.shutter_position, 
+        emb_vars.analysis_steps, emb_vars.analysis_geometry, emb_vars.analysis_max_verts, 
+        scene.render.resolution_x, scene.render.resolution_y, 
+        scene.render.resolution_percentage, 
+        scene.camera.name if scene.camera else None)).encode())
+    
+    objects = getMotionObjects(context) + ([scene.camera] if scene.camera else [])
+    for datablock in getAnimationSources(objects):
+        h.update(repr((type(datablock).__name__, datablock.name)).encode())
+        if (datablock.bl_rna.identifier == 'Object'):
+            if (datablock.parent):
+                h.update(datablock.parent.name.encode())
+            # geometry and deformers, not their evaluated state which
+            # depends on the current frame
+            if (datablock.type == 'MESH'):
+                h.update(repr((datablock.data.name, len(datablock.data.vertices), 
+                    [mod.type for mod in datablock.modifiers])).encode())
+        elif (datablock.bl_rna.identifier == 'Camera'):
+            # the lens moves everything on screen as much as the camera does
+            h.update(repr((datablock.type, datablock.lens, datablock.ortho_scale, datablock.sensor_fit, 
+                datablock.sensor_width, datablock.sensor_height, datablock.shift_x, datablock.shift_y)).encode())
+        # keyframes and drivers, or the transform of static objects
+        anim = getattr(datablock, 'animation_data', None)
+        if (not anim):
+            if (hasattr(datablock, 'matrix_basis')):
+                h.update(np.array(datablock.matrix_basis).tobytes())
+            continue
+        fcurves = list(anim.drivers)
+        if (anim.action):
+            fcurves += list(anim.action.fcurves)
+        for fc in fcurves:
+            h.update((fc.data_path + str(fc.array_index)).encode())
+            co = np.empty(len(fc.keyframe_points) * 2, dtype=np.float32)
+            fc.keyframe_points.foreach_get('co', co)
+            h.update(co.tobytes())
+    return (h.hexdigest())
 
 
 # #################################### ###################################
@@ -431,12 +3113,10 @@ class RENDER_OT_render_eevee_forceblur_frame(bpy.types.Operator):
         frame=context.scene.frame_current
         shutter_mult = context.scene.eevee.motion_blur_shutter
         samples=context.scene.eevee.motion_blur_samples
-        try: 
-            renderMBx1fr(frame, shutter_mult, samples, context)
-        except ExitOK:
-            print("OK")
-        except ExitError:
-            print("Failed")
+        info = {}
+        if (renderMBx1fr(frame, shutter_mult, samples, context, info=info) is False):
+            self.report({'ERROR'}, "Motion blur render failed: " + str(info.get('error')))
+            return {'CANCELLED'}
 
         return {'FINISHED'}
 
@@ -451,11 +3131,44 @@ class RENDER_OT_render_eevee_forceblur_sequence(bpy.types.Operator):
         startframe = bpy.context.scene.frame_start
         endframe = bpy.context.scene.frame_end
         try: 
-            renderMB_sequence(startframe, endframe, context)
-        except :
-            print("!!!")
-        
+            ok = renderMB_sequence(startframe, endframe, context)
+        except Exception as e:
+            traceback.print_exc()
+            self.report({'ERROR'}, "Motion blur sequence failed: " + str(e))
+            return {'CANCELLED'}
+        if (not ok):
+            self.report({'WARNING'}, "Some frames failed, see the console and emb_journal.json")
+
+        return {'FINISHED'}
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+class RENDER_OT_render_eevee_forceblur_recomposite(bpy.types.Operator):
+    """Average the cached subframes of the current frame again with the current shutter curve and gamma, without rendering"""
+    bl_idname = "render.render_eevee_forceblur_recomposite"
+    bl_label = "Recomposite from cache"
 
+    def execute(self, context):
+        frame = context.scene.frame_current
+        if (not recompositeMBx1fr(frame, context)):
+            self.report({'WARNING'}, "No usable cached subframes for frame " + str(frame))
+            return {'CANCELLED'}
+
+        return {'FINISHED'}
+
+# ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
+
+class RENDER_OT_eevee_forceblur_shutter_curve(bpy.types.Operator):
+    """Create the custom shutter curve"""
+    bl_idname = "render.eevee_forceblur_shutter_curve"
+    bl_label = "Create curve"
+
+    def execute(self, context):
+        if (getShutterCurveNode() is None):
+            group = bpy.data.node_groups.new('__emb_shutter_curve__', 'ShaderNodeTree')
+            group.use_fake_user = True
+            node = group.nodes.new('ShaderNodeRGBCurve')
+            node.name = 'Shutter'
         return {'FINISHED'}
 
 # ––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––––
@@ -490,6 +3203,242 @@ class eeveeMotionBlur_variables(bpy.types.PropertyGroup):
         description="gamma to compensate for inaccurate image saving",
         default=0.454545
     )
+    use_progressive : bpy.props.BoolProperty(
+        name="Progressive sampling",
+        description="render subframes until the noise of the average is below the threshold everywhere, between minimum and maximum samples",
+        default=False
+    )
+    noise_threshold : bpy.props.FloatProperty(
+        name="Noise threshold",
+        description="largest standard error of the averaged luminance allowed in any tile",
+        default=0.005,
+        min=0.0,
+        precision=4
+    )
+    progressive_tile : bpy.props.IntProperty(
+        name="Tile size",
+        description="size in pixels of the tiles the noise is measured in",
+        default=32,
+        min=1
+    )
+    shutter_curve : bpy.props.EnumProperty(
+        name="Shutter curve",
+        description="how much each moment of the exposure counts in the blur",
+        items=[
+            ('BOX', "Box", "every subframe counts the same"),
+            ('TRIANGLE', "Triangle", "opens and closes linearly"),
+            ('GAUSSIAN', "Gaussian", "smooth bell, soft trails"),
+            ('CUSTOM', "Custom", "use the curve below")
+        ],
+        default='BOX'
+    )
+    shutter_position : bpy.props.EnumProperty(
+        name="Shutter position",
+        description="when the shutter opens relative to the frame",
+        items=[
+            ('START', "Start on frame", "the exposure starts on the frame"),
+            ('CENTER', "Center on frame", "the exposure is centered on the frame, half of it before"),
+            ('END', "End on frame", "the exposure ends on the frame")
+        ],
+        default='START'
+    )
+    shared_subframes : bpy.props.IntProperty(
+        name="Shared subframes",
+        description="rendered subframes kept in memory for the next frames when their shutters overlap (centered shutters, shutters longer than the frame step), each one is rendered once. 0 renders every frame on its own",
+        default=8,
+        min=0
+    )
+    rolling_shutter : bpy.props.FloatProperty(
+        name="Rolling shutter",
+        description="frames it takes to read out the sensor from top to bottom, 0 for a global shutter",
+        default=0.0,
+        min=0.0,
+        max=1.0
+    )
+    use_subframe_cache : bpy.props.BoolProperty(
+        name="Cache subframes",
+        description="keep rendered subframes compressed on disk, to recomposite with another shutter curve or gamma without rendering",
+        default=False
+    )
+    subframe_cache_dir : bpy.props.StringProperty(
+        name="Cache folder",
+        description="where the subframes are cached",
+        default="//emb_cache/",
+        subtype='DIR_PATH'
+    )
+    use_resume : bpy.props.BoolProperty(
+        name="Resume",
+        description="skip frames the journal next to the output says are already rendered and unchanged on disk, and resume frames from their checkpoint",
+        default=False
+    )
+    checkpoint_interval : bpy.props.IntProperty(
+        name="Checkpoint every",
+        description="subframes between saves of the partial frame to disk, 0 disables checkpoints",
+        default=0,
+        min=0
+    )
+    use_async_save : bpy.props.BoolProperty(
+        name="Save in background",
+        description="encode PNG frames in background threads while the next frame renders. Only used with the Standard view transform",
+        default=True
+    )
+    save_threads : bpy.props.IntProperty(
+        name="Save threads",
+        description="threads encoding images, also the number of finished frames that can wait in memory",
+        default=2,
+        min=1
+    )
+    worker_count : bpy.props.IntProperty(
+        name="Workers",
+        description="background blender processes that render the sequence in parallel, 0 renders in this blender",
+        default=0,
+        min=0
+    )
+    worker_chunk : bpy.props.IntProperty(
+        name="Frames per job",
+        description="frames handed to a worker at a time, bigger chunks load the file less often",
+        default=1,
+        min=1
+    )
+    worker_retries : bpy.props.IntProperty(
+        name="Retries",
+        description="times a failed frame is rendered again",
+        default=2,
+        min=0
+    )
+    use_regions : bpy.props.BoolProperty(
+        name="Render moving regions only",
+        description="render subframes only in the part of the frame where objects move, the rest is taken from the base frame. Shadows and reflections of moving objects outside the region are not blurred. Off with a rolling shutter",
+        default=False
+    )
+    region_padding : bpy.props.IntProperty(
+        name="Region padding",
+        description="pixels added around the moving region",
+        default=16,
+        min=0
+    )
+    region_max_coverage : bpy.props.FloatProperty(
+        name="Max region size",
+        description="fraction of the frame above which full frames are rendered instead",
+        default=0.6,
+        min=0.0,
+        max=1.0
+    )
+    use_reprojection : bpy.props.BoolProperty(
+        name="Reproject camera moves",
+        description="when only the camera moves, render the first subframe with depth and reproject it through the camera of the others. Needs the OpenEXR python module",
+        default=False
+    )
+    reprojection_holes : bpy.props.FloatProperty(
+        name="Max holes",
+        description="fraction of a reprojected subframe left uncovered above which the uncovered part is rendered for real",
+        default=0.01,
+        min=0.0,
+        max=1.0,
+        precision=3
+    )
+    quality_preset : bpy.props.EnumProperty(
+        name="Quality",
+        description="final renders every subframe as set, previews render only the first one like that and the blur at a lower resolution and with fewer Eevee samples",
+        items=[
+            ('FINAL', "Final", "every subframe at full resolution and samples"),
+            ('PREVIEW_HIGH', "Preview", "blur at half resolution and a quarter of the samples"),
+            ('PREVIEW_FAST', "Fast preview", "blur at a quarter of the resolution and an eighth of the samples")
+        ],
+        default='FINAL'
+    )
+    use_raw_capture : bpy.props.BoolProperty(
+        name="Composite once",
+        description="render subframes without the compositor and run it once on their average. Faster with heavy node trees, and effects like glare see the blurred image. Needs a single Render Layers node",
+        default=False
+    )
+    use_motion_tiers : bpy.props.BoolProperty(
+        name="Motion tiers",
+        description="render fast objects apart with more subframes and the rest of the frame with fewer, then composite them. Shadows and reflections of the fast objects are not blurred. Needs Blender 2.90 or newer",
+        default=False
+    )
+    tier_samples : bpy.props.IntProperty(
+        name="Background samples",
+        description="objects that need up to this many subframes are rendered with the background, faster ones in tiers of doubling samples",
+        default=4,
+        min=1
+    )
+    analysis_mode : bpy.props.EnumProperty(
+        name="Motion analysis",
+        description="how object motion is measured for adaptive sampling",
+        items=[
+            ('BOUNDS', "Frame to frame", "compare positions at frame N and N+1"),
+            ('SUBFRAMES', "Shutter path", "follow the motion path through the shutter, catches rotation and curved paths")
+        ],
+        default='BOUNDS'
+    )
+    analysis_steps : bpy.props.IntProperty(
+        name="Path steps",
+        description="number of steps the shutter is split into to follow the motion path",
+        default=4,
+        min=1
+    )
+    analysis_geometry : bpy.props.EnumProperty(
+        name="Measure",
+        description="points of each object that are followed",
+        items=[
+            ('BOX', "Bounding box", "the 8 corners of the bounding box"),
+            ('VERTICES', "Vertices", "the evaluated mesh vertices, catches deformation")
+        ],
+        default='BOX'
+    )
+    analysis_max_verts : bpy.props.IntProperty(
+        name="Max vertices",
+        description="vertices per object followed when measuring vertices, the mesh is decimated evenly",
+        default=256,
+        min=8
+    )
+    motion_cache : bpy.props.StringProperty(
+        name="Motion cache",
+        description="adaptive sample counts of the last analysed sequence",
+        default=""
+    )
+    accumulator_backend : bpy.props.EnumProperty(
+        name="Accumulate in",
+        description="where the running sum of the subframes is kept",
+        items=[
+            ('AUTO', "Auto", "on disk only if it doesn't fit in the free memory"),
+            ('RAM', "Memory", "keep the sum in memory"),
+            ('DISK', "Disk", "keep the sum in a memory mapped file, for very large frames")
+        ],
+        default='AUTO'
+    )
+    scratch_dir : bpy.props.StringProperty(
+        name="Scratch folder",
+        description="folder for the on disk accumulator, empty uses the system temp folder. Use a fast local disk",
+        default="",
+        subtype='DIR_PATH'
+    )
+    use_double_precision : bpy.props.BoolProperty(
+        name="Double precision",
+        description="accumulate subframes in 64 bit floats, uses twice the memory",
+        default=False
+    )
+    use_multilayer : bpy.props.BoolProperty(
+        name="Render passes",
+        description="average every pass of the view layers instead of the composite only, and save them as a multilayer EXR. Depth keeps the nearest surface, IDs and cryptomatte the first subframe. Needs the OpenEXR python module",
+        default=False
+    )
+    verbosity : bpy.props.EnumProperty(
+        name="Console output",
+        description="how much progress is printed to the console",
+        items=[
+            ('QUIET', "Quiet", "errors only"),
+            ('NORMAL', "Normal", "frames, subframes and summaries"),
+            ('VERBOSE', "Verbose", "also every moving object found by the motion analysis")
+        ],
+        default='NORMAL'
+    )
+    use_metrics_log : bpy.props.BoolProperty(
+        name="Metrics log",
+        description="write the timings of every frame and a summary of the sequence as JSON lines to emb_metrics.jsonl next to the output",
+        default=False
+    )
 
 # #################################### ###################################
 #                                   PANEL
@@ -519,6 +3468,11 @@ class RENDER_PT_force_emb_panel(bpy.types.Panel):
         
         row.operator("render.render_eevee_forceblur_sequence")
         
+        # final or preview quality
+        row = layout.row()
+        row.active = not scene.eeveeMotionBlur_vars.use_progressive and not scene.eeveeMotionBlur_vars.use_multilayer
+        row.prop(scene.eeveeMotionBlur_vars, "quality_preset", expand=True)
+        
         # Start / End
         row = layout.row()
         row.prop(scene, "frame_start")
@@ -532,21 +3486,144 @@ class RENDER_PT_force_emb_panel(bpy.types.Panel):
         col = layout.column(align=True)
         col.prop(scene.eevee, "motion_blur_shutter")
         
+        # shutter shape
+        col = layout.column(align=True)
+        col.prop(scene.eeveeMotionBlur_vars, "shutter_curve")
+        if (scene.eeveeMotionBlur_vars.shutter_curve == 'CUSTOM'):
+            node = getShutterCurveNode()
+            if (node is None):
+                col.operator("render.eevee_forceblur_shutter_curve")
+            else:
+                col.template_curve_mapping(node, "mapping")
+        col.prop(scene.eeveeMotionBlur_vars, "shutter_position")
+        col.prop(scene.eeveeMotionBlur_vars, "rolling_shutter")
+        col.prop(scene.eeveeMotionBlur_vars, "shared_subframes")
+        
+        # subframe cache
+        col = layout.column(align=True)
+        row = col.row(align=True)
+        row.prop(scene.eeveeMotionBlur_vars, "use_subframe_cache")
+        row.operator("render.render_eevee_forceblur_recomposite")
+        sub = col.column(align=True)
+        sub.active = scene.eeveeMotionBlur_vars.use_subframe_cache
+        sub.prop(scene.eeveeMotionBlur_vars, "subframe_cache_dir")
+        
+        # progressive sampling
+        col = layout.column(align=True)
+        col.prop(scene.eeveeMotionBlur_vars, "use_progressive")
+        sub = col.column(align=True)
+        sub.active = scene.eeveeMotionBlur_vars.use_progressive
+        sub.prop(scene.eeveeMotionBlur_vars, "noise_threshold")
+        sub.prop(scene.eeveeMotionBlur_vars, "progressive_tile")
+        
         # adaptive sampling
         col = layout.column(align=True)
         row = layout.row()
         col.prop(scene.eeveeMotionBlur_vars, "use_adaptive")
         
-        col.active = scene.eeveeMotionBlur_vars.use_adaptive
+        col.active = scene.eeveeMotionBlur_vars.use_adaptive and not scene.eeveeMotionBlur_vars.use_progressive
         row = layout.row()
         col.prop(scene.eeveeMotionBlur_vars, "pixel_tolerance")
         row = layout.row()
-        col.prop(scene.eeveeMotionBlur_vars, "min_samples")
-        col.prop(scene.eeveeMotionBlur_vars, "max_samples")
+        sub = col.column(align=True)
+        sub.active = scene.eeveeMotionBlur_vars.use_adaptive or scene.eeveeMotionBlur_vars.use_progressive
+        sub.prop(scene.eeveeMotionBlur_vars, "min_samples")
+        sub.prop(scene.eeveeMotionBlur_vars, "max_samples")
+        col.prop(scene.eeveeMotionBlur_vars, "analysis_mode")
+        sub = col.column(align=True)
+        sub.active = (scene.eeveeMotionBlur_vars.analysis_mode == 'SUBFRAMES')
+        sub.prop(scene.eeveeMotionBlur_vars, "analysis_steps")
+        col.prop(scene.eeveeMotionBlur_vars, "analysis_geometry")
+        sub = col.column(align=True)
+        sub.active = (scene.eeveeMotionBlur_vars.analysis_geometry == 'VERTICES')
+        sub.prop(scene.eeveeMotionBlur_vars, "analysis_max_verts")
+        
+        # moving regions
+        col = layout.column(align=True)
+        col.active = not scene.eeveeMotionBlur_vars.use_progressive and scene.eeveeMotionBlur_vars.rolling_shutter == 0
+        col.prop(scene.eeveeMotionBlur_vars, "use_regions")
+        sub = col.column(align=True)
+        sub.active = scene.eeveeMotionBlur_vars.use_regions
+        sub.prop(scene.eeveeMotionBlur_vars, "region_padding")
+        sub.prop(scene.eeveeMotionBlur_vars, "region_max_coverage")
+        
+        # camera only reprojection
+        col = layout.column(align=True)
+        col.active = not scene.eeveeMotionBlur_vars.use_progressive
+        row = col.row(align=True)
+        row.prop(scene.eeveeMotionBlur_vars, "use_reprojection")
+        if (scene.eeveeMotionBlur_vars.use_reprojection and OpenEXR is None):
+            row.label(text="OpenEXR module not found", icon='ERROR')
+        sub = col.column(align=True)
+        sub.active = scene.eeveeMotionBlur_vars.use_reprojection
+        sub.prop(scene.eeveeMotionBlur_vars, "reprojection_holes")
+        
+        # compositor once per frame
+        row = layout.row()
+        row.active = not scene.eeveeMotionBlur_vars.use_progressive
+        row.prop(scene.eeveeMotionBlur_vars, "use_raw_capture")
+        
+        # motion tiers
+        col = layout.column(align=True)
+        col.active = not scene.eeveeMotionBlur_vars.use_progressive
+        col.prop(scene.eeveeMotionBlur_vars, "use_motion_tiers")
+        sub = col.column(align=True)
+        sub.active = scene.eeveeMotionBlur_vars.use_motion_tiers
+        sub.prop(scene.eeveeMotionBlur_vars, "tier_samples")
+        
+        # resume
+        row = layout.row()
+        row.prop(scene.eeveeMotionBlur_vars, "use_resume")
+        row.prop(scene.eeveeMotionBlur_vars, "checkpoint_interval")
+        
+        # parallel workers
+        col = layout.column(align=True)
+        col.prop(scene.eeveeMotionBlur_vars, "worker_count")
+        sub = col.column(align=True)
+        sub.active = scene.eeveeMotionBlur_vars.worker_count > 0
+        sub.prop(scene.eeveeMotionBlur_vars, "worker_chunk")
+        sub.prop(scene.eeveeMotionBlur_vars, "worker_retries")
+        
+        # render passes
+        row = layout.row()
+        row.prop(scene.eeveeMotionBlur_vars, "use_multilayer")
+        if (scene.eeveeMotionBlur_vars.use_multilayer and OpenEXR is None):
+            row.label(text="OpenEXR module not found", icon='ERROR')
         
         # Image gamma
         row = layout.row()
+        row.active = not scene.eeveeMotionBlur_vars.use_multilayer
         row.prop(scene.eeveeMotionBlur_vars, "gamma")
+        row = layout.row()
+        row.prop(scene.eeveeMotionBlur_vars, "use_async_save")
+        sub = row.row()
+        sub.active = scene.eeveeMotionBlur_vars.use_async_save
+        sub.prop(scene.eeveeMotionBlur_vars, "save_threads")
+        row = layout.row()
+        row.prop(scene.eeveeMotionBlur_vars, "use_double_precision")
+        col = layout.column(align=True)
+        col.prop(scene.eeveeMotionBlur_vars, "accumulator_backend")
+        sub = col.column(align=True)
+        sub.active = scene.eeveeMotionBlur_vars.accumulator_backend != 'RAM'
+        sub.prop(scene.eeveeMotionBlur_vars, "scratch_dir")
+        
+        # metrics
+        row = layout.row()
+        row.prop(scene.eeveeMotionBlur_vars, "verbosity")
+        row.prop(scene.eeveeMotionBlur_vars, "use_metrics_log")
+        for key, title in (('frame', "Last frame"), ('sequence', "Last sequence")):
+            record = lastMetrics.get(key)
+            if (not record):
+                continue
+            box = layout.box()
+            col = box.column(align=True)
+            col.label(text=title + ": " + str(record.get('samples')) + " subframes in " + 
+                str(round(record.get('seconds', 0.0), 1)) + "s, " + 
+                str(round(record.get('peak_memory', 0) / 2**20)) + " MB")
+            stages = record.get('mean_stages', record['stages'])
+            for stage in mbMetrics.STAGES:
+                if (stages.get(stage)):
+                    col.label(text="    " + stage + ": " + str(round(stages[stage], 2)) + "s")
         
 
 # #################################### ###################################
@@ -559,11 +3636,49 @@ class RENDER_PT_force_emb_panel(bpy.types.Panel):
 #    eeveeMotionBlur_vars.min_samples
 #    eeveeMotionBlur_vars.max_samples
 #    eeveeMotionBlur_vars.gamma
+#    eeveeMotionBlur_vars.use_double_precision
+#    eeveeMotionBlur_vars.use_multilayer
+#    eeveeMotionBlur_vars.verbosity
+#    eeveeMotionBlur_vars.use_metrics_log
+#    eeveeMotionBlur_vars.accumulator_backend
+#    eeveeMotionBlur_vars.scratch_dir
+#    eeveeMotionBlur_vars.use_progressive
+#    eeveeMotionBlur_vars.noise_threshold
+#    eeveeMotionBlur_vars.progressive_tile
+#    eeveeMotionBlur_vars.shutter_curve
+#    eeveeMotionBlur_vars.shutter_position
+#    eeveeMotionBlur_vars.shared_subframes
+#    eeveeMotionBlur_vars.rolling_shutter
+#    eeveeMotionBlur_vars.use_subframe_cache
+#    eeveeMotionBlur_vars.subframe_cache_dir
+#    eeveeMotionBlur_vars.use_resume
+#    eeveeMotionBlur_vars.checkpoint_interval
+#    eeveeMotionBlur_vars.use_async_save
+#    eeveeMotionBlur_vars.save_threads
+#    eeveeMotionBlur_vars.worker_count
+#    eeveeMotionBlur_vars.worker_chunk
+#    eeveeMotionBlur_vars.worker_retries
+#    eeveeMotionBlur_vars.use_regions
+#    eeveeMotionBlur_vars.region_padding
+#    eeveeMotionBlur_vars.region_max_coverage
+#    eeveeMotionBlur_vars.use_reprojection
+#    eeveeMotionBlur_vars.reprojection_holes
+#    eeveeMotionBlur_vars.quality_preset
+#    eeveeMotionBlur_vars.use_raw_capture
+#    eeveeMotionBlur_vars.use_motion_tiers
+#    eeveeMotionBlur_vars.tier_samples
+#    eeveeMotionBlur_vars.analysis_mode
+#    eeveeMotionBlur_vars.analysis_steps
+#    eeveeMotionBlur_vars.analysis_geometry
+#    eeveeMotionBlur_vars.analysis_max_verts
+#    eeveeMotionBlur_vars.motion_cache
 
 
 classes = (
     RENDER_OT_render_eevee_forceblur_frame,
     RENDER_OT_render_eevee_forceblur_sequence,
+    RENDER_OT_render_eevee_forceblur_recomposite,
+    RENDER_OT_eevee_forceblur_shutter_curve,
     eeveeMotionBlur_variables,
     RENDER_PT_force_emb_panel
 )
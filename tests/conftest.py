@@ -0,0 +1,51 @@
+"""Runs the addon against the fake bpy of the benchmarks
+
+    python -m pytest -q tests
+"""
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+
+import fake_bpy
+bpy = fake_bpy.install()
+import eevee_motion_blur as emb
+
+
+@pytest.fixture
+def scene(tmp_path):
+    """Small quiet scene that saves and caches under tmp_path"""
+    scene = fake_bpy.setup_scene(emb, 16, 8, verbosity='QUIET', use_adaptive=False,
+        subframe_cache_dir=str(tmp_path / "cache") + os.sep, scratch_dir=str(tmp_path))
+    scene.render.filepath = str(tmp_path / "out") + os.sep
+    scene.render.image_settings.exr_codec = 'ZIP'
+    scene.eevee.motion_blur_samples = 4
+    return (scene)
+
+
+def readPNG(path):
+    """(header, rows) of a PNG without filters, like writePNG makes"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    chunks = {}
+    pos = 8
+    while (pos < len(data)):
+        length, tag = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 4:pos + 8 + length]
+        assert struct.unpack(">I", data[pos + 8 + length:pos + 12 + length])[0] == zlib.crc32(body) & 0xffffffff
+        chunks[tag] = body[4:]
+        pos += 12 + length
+    width, height, bitdepth, color_type = struct.unpack(">IIBB", chunks[b"IHDR"][:10])
+    raw = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, -1)
+    # every row starts with filter type 0
+    assert not raw[:, 0].any()
+    return ((width, height, bitdepth, color_type), raw[:, 1:])
@@ -0,0 +1,99 @@
+import sys
+
+import numpy as np
+import pytest
+
+from conftest import emb
+
+
+WIDTH, HEIGHT = 6, 4
+
+
+def subframes(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return ([rng.random(WIDTH * HEIGHT * 4, dtype=np.float32) for i in range(count)])
+
+
+@pytest.mark.parametrize("backend", ['RAM', 'DISK'])
+def test_weighted_average(tmp_path, backend):
+    buffers = subframes(5)
+    weights = [1.0, 2.0, 0.5, 1.0, 3.0]
+    expected = sum(b * w for b, w in zip(buffers, weights)) / sum(weights)
+    accumulator = emb.mbAccumulator(WIDTH * HEIGHT * 4, width=WIDTH, backend=backend, scratch=str(tmp_path))
+    for buffer, weight in zip(buffers, weights):
+        # add() clobbers what it is given
+        accumulator.add(buffer.copy(), weight)
+    assert accumulator.count == 5
+    np.testing.assert_allclose(accumulator.finish(), expected, rtol=1e-5)
+    accumulator.close()
+
+
+def test_weight_per_row():
+    buffers = subframes(3)
+    weights = [np.linspace(1.0, 2.0, HEIGHT), np.ones(HEIGHT), np.linspace(0.0, 1.0, HEIGHT)]
+    rows = [b.reshape(HEIGHT, WIDTH, 4) * w[:, None, None] for b, w in zip(buffers, weights)]
+    expected = sum(rows) / sum(weights)[:, None, None]
+    accumulator = emb.mbAccumulator(WIDTH * HEIGHT * 4, width=WIDTH)
+    for buffer, weight in zip(buffers, weights):
+        accumulator.add(buffer.copy(), weight)
+    np.testing.assert_allclose(accumulator.finish().reshape(HEIGHT, WIDTH, 4), expected, rtol=1e-5)
+
+
+def test_region_keeps_full_frame_average_outside():
+    full, extra = subframes(2), subframes(2, seed=1)
+    region = (1, 1, 4, 3)
+    accumulator = emb.mbAccumulator(WIDTH * HEIGHT * 4, width=WIDTH)
+    for buffer in full:
+        accumulator.add(buffer.copy())
+    for buffer in extra:
+        accumulator.add(buffer.copy(), region=region)
+    result = accumulator.finish().reshape(HEIGHT, WIDTH, 4)
+
+    x0, y0, x1, y1 = region
+    full_mean = (sum(full) / 2).reshape(HEIGHT, WIDTH, 4)
+    all_mean = (sum(full + extra) / 4).reshape(HEIGHT, WIDTH, 4)
+    inside = np.zeros((HEIGHT, WIDTH), dtype=bool)
+    inside[y0:y1, x0:x1] = True
+    np.testing.assert_allclose(result[inside], all_mean[inside], rtol=1e-5)
+    np.testing.assert_allclose(result[~inside], full_mean[~inside], rtol=1e-5)
+
+    with pytest.raises(ValueError):
+        accumulator = emb.mbAccumulator(WIDTH * HEIGHT * 4, width=WIDTH)
+        accumulator.add(full[0].copy(), region=region)
+        accumulator.add(full[1].copy(), region=(0, 0, 2, 2))
+
+
+def test_gamma():
+    buffer = np.full(WIDTH * HEIGHT * 4, 0.25, dtype=np.float32)
+    accumulator = emb.mbAccumulator(buffer.size, width=WIDTH)
+    accumulator.add(buffer)
+    np.testing.assert_allclose(accumulator.finish(0.5), 0.5, rtol=1e-6)
+
+
+def test_checkpoint_resumes(tmp_path):
+    buffers = subframes(4)
+    path = str(tmp_path / "partial.npz")
+    meta = {'frame' : 1, 'samples' : 4, 'next' : 2}
+    first = emb.mbAccumulator(WIDTH * HEIGHT * 4, width=WIDTH)
+    for buffer in buffers[:2]:
+        first.add(buffer.copy())
+    first.save(path, meta)
+
+    resumed = emb.mbAccumulator(WIDTH * HEIGHT * 4, width=WIDTH)
+    assert resumed.load(path, {'frame' : 1, 'samples' : 8}) is None
+    assert resumed.load(path, {'frame' : 1, 'samples' : 4})['next'] == 2
+    for buffer in buffers[2:]:
+        resumed.add(buffer.copy())
+    assert resumed.count == 4
+    np.testing.assert_allclose(resumed.finish(), sum(buffers) / 4, rtol=1e-5)
+
+
+def test_available_memory_counts_the_page_cache(tmp_path, monkeypatch):
+    # blender ships without psutil
+    monkeypatch.setitem(sys.modules, 'psutil', None)
+    meminfo = tmp_path / "meminfo"
+    meminfo.write_text("MemTotal:       65536000 kB\nMemFree:         1024000 kB\nMemAvailable:   48000000 kB\n")
+    assert emb.getAvailableMemory(str(meminfo)) == 48000000 * 1024
+    # without it, the free pages
+    free = emb.getAvailableMemory(str(tmp_path / "missing"))
+    assert free is None or free > 0
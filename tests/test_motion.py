@@ -0,0 +1,188 @@
+import types
+
+import numpy as np
+import pytest
+
+from conftest import bpy, emb, fake_bpy
+
+
+WIDTH, HEIGHT = 160, 90
+# the fake camera sees 0.72 units across per unit of depth
+FRAME_WIDTH = 2 * 0.5 * 36.0 / 50.0
+
+
+def motionScene(objects, **settings):
+    """Scene with only the given objects, in front of the camera at z=20"""
+    scene = fake_bpy.setup_scene(emb, WIDTH, HEIGHT, verbosity='QUIET', **settings)
+    scene.objects = list(objects)
+    return (scene)
+
+
+def test_object_deltas():
+    # the nearest corners of a cube at the origin are 19.5 from the camera
+    fast = fake_bpy.Object("Fast", (0.0, 0.0, 0.0), 0.5)
+    still = fake_bpy.Object("Still", (2.0, 1.0, 0.0), 0.0)
+    behind = fake_bpy.Object("Behind", (0.0, 0.0, 30.0), 1.0)
+    beside = fake_bpy.Object("Beside", (100.0, 0.0, 0.0), 1.0)
+    motionScene([fast, still, behind, beside], analysis_mode='BOUNDS')
+
+    deltas = emb.getObjectDeltas(bpy.context, 1)
+    assert set(deltas) == {"Fast", "Still"}
+    assert deltas["Still"] == 0.0
+    # frame N to N+1, a chord of the unit circle
+    chord = 2 * np.sin(0.5 / 2)
+    np.testing.assert_allclose(deltas["Fast"], chord * WIDTH / (FRAME_WIDTH * 19.5), rtol=1e-6)
+    assert emb.getMaxDelta(bpy.context, 1) == deltas["Fast"]
+
+
+def test_no_objects_no_motion():
+    motionScene([])
+    assert emb.getObjectDeltas(bpy.context, 1) == {}
+    assert emb.getMaxDelta(bpy.context, 1) == 0
+
+
+class Keyframes(list):
+    def foreach_get(self, attr, buffer):
+        buffer[:] = [value for point in self for value in point]
+
+
+def animate(datablock, *keys):
+    """Gives a datablock an action with one fcurve through keys"""
+    fcurve = types.SimpleNamespace(data_path="location", array_index=0, keyframe_points=Keyframes(keys))
+    datablock.animation_data = types.SimpleNamespace(drivers=[], action=types.SimpleNamespace(fcurves=[fcurve]))
+    return (fcurve)
+
+
+def test_hash_follows_everything_that_moves_objects():
+    cube = fake_bpy.Object("Cube", (0.0, 0.0, 0.0), 0.0)
+    scene = motionScene([cube])
+    hashes = [emb.getAnimationHash(bpy.context, 0.5)]
+
+    parent = fake_bpy.Object("Parent", (0.0, 0.0, 0.0), 0.0, type_='EMPTY')
+    cube.parent = parent
+    fcurve = animate(parent, (1, 0), (10, 2))
+    hashes.append(emb.getAnimationHash(bpy.context, 0.5))
+    fcurve.keyframe_points = Keyframes([(1, 0), (10, 5)])
+    hashes.append(emb.getAnimationHash(bpy.context, 0.5))
+
+    rig = fake_bpy.Object("Rig", (0.0, 0.0, 0.0), 0.0, type_='ARMATURE')
+    cube.modifiers = [types.SimpleNamespace(type='ARMATURE', object=rig)]
+    hashes.append(emb.getAnimationHash(bpy.context, 0.5))
+    animate(rig, (1, 0), (5, 1))
+    hashes.append(emb.getAnimationHash(bpy.context, 0.5))
+
+    target = fake_bpy.Object("Target", (0.0, 0.0, 0.0), 0.0, type_='EMPTY')
+    cube.constraints = [types.SimpleNamespace(target=target)]
+    animate(target, (1, 0), (5, 1))
+    hashes.append(emb.getAnimationHash(bpy.context, 0.5))
+
+    cube.data.shape_keys = fake_bpy.ID("Key")
+    animate(cube.data.shape_keys, (1, 0), (5, 1))
+    hashes.append(emb.getAnimationHash(bpy.context, 0.5))
+
+    scene.camera.data.lens = 35.0
+    hashes.append(emb.getAnimationHash(bpy.context, 0.5))
+    assert len(set(hashes)) == len(hashes)
+    # and nothing else
+    assert emb.getAnimationHash(bpy.context, 0.5) == hashes[-1]
+
+
+def test_sequence_budgets_are_cached(monkeypatch):
+    cube = fake_bpy.Object("Cube", (0.0, 0.0, 0.0), 0.5)
+    motionScene([cube], use_adaptive=True)
+    analysed = []
+    prepass = emb.motionPrepass
+    def spy(context, frames):
+        analysed.append(list(frames))
+        return (prepass(context, frames))
+    monkeypatch.setattr(emb, 'motionPrepass', spy)
+
+    budgets = emb.getSequenceBudgets(bpy.context, [1, 2, 3], 0.5)
+    again = emb.getSequenceBudgets(bpy.context, [1, 2, 3, 4], 0.5)
+    assert {frame : again[frame] for frame in budgets} == budgets
+    assert analysed == [[1, 2, 3], [4]]
+    # new animation, everything again
+    animate(cube, (1, 0), (2, 1))
+    emb.getSequenceBudgets(bpy.context, [1, 2], 0.5)
+    assert analysed[-1] == [1, 2]
+
+
+class Vertices():
+    def __init__(self, co):
+        self.co = np.asarray(co, dtype=np.float32)
+
+    def __len__(self):
+        return (len(self.co))
+
+    def foreach_get(self, attr, buffer):
+        buffer[:] = self.co.ravel()
+
+
+def withMesh(obj, vertices):
+    """Gives a fake object an evaluated mesh, vertices(time) -> (n, 3)"""
+    evaluate = obj.evaluate
+    def evaluateAt(time):
+        obj.time = time
+        evaluate(time)
+    obj.evaluate = evaluateAt
+    obj.evaluated_get = lambda depsgraph: obj
+    obj.to_mesh = lambda: types.SimpleNamespace(vertices=Vertices(vertices(obj.time)))
+    obj.to_mesh_clear = lambda: None
+    obj.evaluate(1.0)
+    return (obj)
+
+
+def test_subframe_path_follows_curves():
+    # half a turn per frame
+    fast = fake_bpy.Object("Fast", (0.0, 0.0, 0.0), np.pi)
+    scene = motionScene([fast], analysis_mode='BOUNDS')
+    scene.eevee.motion_blur_shutter = 1.0
+    chord = emb.getObjectDeltas(bpy.context, 1)["Fast"]
+    scene.eeveeMotionBlur_vars.analysis_mode = 'SUBFRAMES'
+    scene.eeveeMotionBlur_vars.analysis_steps = 32
+    arc = emb.getObjectDeltas(bpy.context, 1)["Fast"]
+    # half the circumference against its diameter
+    np.testing.assert_allclose(arc / chord, np.pi / 2, rtol=1e-2)
+
+
+def test_changing_vertex_count_is_measured_by_the_box(monkeypatch):
+    monkeypatch.setattr(bpy.context, 'evaluated_depsgraph_get', lambda: None, raising=False)
+    rng = np.random.default_rng(0)
+    # still, but gains vertices along the shutter
+    growing = withMesh(fake_bpy.Object("Growing", (0.0, 0.0, 0.0), 0.0), 
+        lambda time: rng.uniform(-0.5, 0.5, (8 + int(time * 8), 3)))
+    box = fake_bpy.Object("Box", (2.0, 0.0, 0.0), 0.0)
+    withMesh(box, lambda time: box.bound_box)
+    motionScene([growing, box], analysis_mode='SUBFRAMES', analysis_steps=4, analysis_geometry='VERTICES')
+    assert emb.getObjectDeltas(bpy.context, 1) == {"Growing" : 0.0, "Box" : 0.0}
+
+
+@pytest.mark.parametrize("camera_type", ['PERSP', 'ORTHO'])
+def test_projection_matches_world_to_camera_view(camera_type):
+    scene = motionScene([])
+    scene.camera.data.type = camera_type
+    # off center and turned, so the inverse matters
+    scene.camera.matrix_world = fake_bpy.Matrix([[0.0, -1.0, 0.0, 1.0], [1.0, 0.0, 0.0, -2.0], 
+        [0.0, 0.0, 1.0, 20.0], [0.0, 0.0, 0.0, 1.0]])
+    coords = np.ones((64, 4))
+    coords[:, :3] = np.random.default_rng(0).uniform(-10, 30, (64, 3))
+
+    projected = emb.mbProjection(scene).project(coords)
+    expected = [fake_bpy.world_to_camera_view(scene, scene.camera, co[:3]) for co in coords]
+    np.testing.assert_allclose(projected, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_frustum_culls_objects_behind_the_camera():
+    scene = motionScene([])
+    projection = emb.mbProjection(scene)
+    def visible(*centers):
+        corners = np.ones((len(centers), 8, 4))
+        for n, center in enumerate(centers):
+            corners[n, :, :3] = np.asarray(fake_bpy.Object("Cube", (0, 0, 0), 0.0).bound_box) + center
+        offsets = np.arange(len(centers)) * 8
+        return (projection.inFrustum(projection.toCamera(corners.reshape(-1, 4)), offsets).tolist())
+    # in front, behind, beside, past the clipping and across the camera
+    assert visible((0, 0, 0), (0, 0, 30), (30, 0, 0), (0, 0, -100), (0, 0, 20)) == [True, False, False, False, True]
+    # behind the camera it would project inside the frame, mirrored
+    co = projection.project(np.array([[1.0, 1.0, 30.0, 1.0]]))
+    assert 0 < co[0, 0] < 1 and 0 < co[0, 1] < 1 and co[0, 2] < 0
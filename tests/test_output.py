@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from conftest import emb, readPNG
+
+
+@pytest.mark.parametrize("alpha, bitdepth", [(True, 8), (False, 8), (True, 16)])
+def test_write_png(tmp_path, alpha, bitdepth):
+    width, height = 5, 3
+    pixels = np.linspace(-0.5, 1.5, width * height * 4, dtype=np.float32)
+    path = str(tmp_path / "sub" / "frame.png")
+    emb.writePNG(path, pixels, width, height, alpha=alpha, bitdepth=bitdepth)
+
+    header, rows = readPNG(path)
+    assert header == (width, height, bitdepth, 6 if alpha else 2)
+    top = 255 if bitdepth == 8 else 65535
+    # blender buffers start at the bottom row
+    expected = np.clip(pixels.reshape(height, width, 4)[::-1], 0.0, 1.0)
+    if (not alpha):
+        expected = expected[..., :3]
+    values = np.ascontiguousarray(rows).view('>u2') if bitdepth == 16 else rows
+    np.testing.assert_array_equal(values.reshape(expected.shape), np.floor(expected * top + 0.5))
+
+
+def test_async_writer_reports_errors(tmp_path):
+    def fail(path):
+        raise OSError("disk full")
+    writer = emb.mbAsyncWriter(threads=2)
+    path = str(tmp_path / "a.png")
+    writer.submit(emb.writePNG, path, np.zeros(16, dtype=np.float32), 2, 2)
+    writer.submit(fail, str(tmp_path / "b.png"))
+    errors = writer.close()
+    assert writer.takeWritten() == [path]
+    assert writer.takeWritten() == []
+    assert [(p, str(e)) for p, e in errors] == [(str(tmp_path / "b.png"), "disk full")]
+
+
+def test_journal(scene):
+    journal = emb.mbJournal(scene)
+    path = emb.getOutputPath(scene, 1)
+    journal.mark(1, 'rendering', path=path)
+    assert not journal.isDone(1)
+    # done without a file is a failure
+    journal.mark(1, 'done')
+    assert journal.frames[1]['status'] == 'failed'
+
+    emb.writePNG(path, np.zeros(16, dtype=np.float32), 2, 2)
+    journal.mark(1, 'done', samples=4)
+    assert journal.isDone(1)
+    # read back from disk
+    journal = emb.mbJournal(scene)
+    assert journal.isDone(1) and journal.frames[1]['samples'] == 4
+    # a changed file has to be rendered again
+    emb.writePNG(path, np.ones(16, dtype=np.float32), 2, 2)
+    assert not journal.isDone(1)
+
+
+def test_confirm_written_ignores_other_paths(scene, tmp_path):
+    journal = emb.mbJournal(scene)
+    writer = emb.mbAsyncWriter()
+    path = emb.getOutputPath(scene, 1)
+    journal.mark(1, 'saving', path=path)
+    saving = {path : 1}
+    # a cached subframe goes through the same writer
+    writer.submit(emb.writeCachedSubframe, str(tmp_path / "cache" / "0001_0.npz"), np.zeros((2, 2, 4)), None)
+    writer.submit(emb.writePNG, path, np.zeros(16, dtype=np.float32), 2, 2)
+    writer.close()
+    emb.confirmWritten(writer, journal, saving)
+    assert saving == {}
+    assert journal.isDone(1)
@@ -0,0 +1,61 @@
+import numpy as np
+
+from conftest import bpy, emb, fake_bpy
+
+
+WIDTH, HEIGHT = 32, 18
+
+
+def dollyScene(objects, speed):
+    """Scene whose camera slides along x at speed units per frame"""
+    scene = fake_bpy.setup_scene(emb, WIDTH, HEIGHT, verbosity='QUIET')
+    camera = scene.camera
+    def evaluate(time):
+        camera.matrix_world = fake_bpy.Matrix.Translation((speed * time, 0.0, 20.0))
+    camera.evaluate = evaluate
+    # frame_set evaluates the scene objects only
+    scene.objects = list(objects) + [camera]
+    return (scene)
+
+
+def test_camera_only_motion():
+    still = fake_bpy.Object("Still", (0.0, 0.0, 0.0), 0.0)
+    dollyScene([still], 1.0)
+    cameras = emb.getCameraOnlyMotion(bpy.context, 1, [0.0, 0.25, 0.5])
+    assert len(cameras) == 3 and not cameras[0].same(cameras[1])
+
+    # the objects move too
+    dollyScene([still, fake_bpy.Object("Moving", (0.0, 0.0, 0.0), 1.0)], 1.0)
+    assert emb.getCameraOnlyMotion(bpy.context, 1, [0.0, 0.25, 0.5]) is None
+    # nothing moves
+    dollyScene([still], 0.0)
+    assert emb.getCameraOnlyMotion(bpy.context, 1, [0.0, 0.25, 0.5]) is None
+
+
+def test_unproject_lands_on_pixel_centers():
+    scene = dollyScene([], 0.0)
+    camera = emb.mbProjection(scene)
+    depth = np.random.default_rng(0).uniform(5.0, 50.0, (HEIGHT, WIDTH))
+    co = camera.project(emb.unprojectPixels(depth, camera))
+
+    x, y = np.meshgrid((np.arange(WIDTH) + 0.5) / WIDTH, (np.arange(HEIGHT) + 0.5) / HEIGHT)
+    np.testing.assert_allclose(co[:, 0], x.ravel())
+    np.testing.assert_allclose(co[:, 1], y.ravel())
+    np.testing.assert_allclose(co[:, 2], depth.ravel())
+
+
+def test_splat_moves_pixels_and_reports_holes():
+    pixels = np.random.default_rng(0).random((HEIGHT, WIDTH, 4), dtype=np.float32)
+    x, y = np.meshgrid((np.arange(WIDTH) + 0.5) / WIDTH, (np.arange(HEIGHT) + 0.5) / HEIGHT)
+    # every pixel one to the right, the first column is left empty
+    target = np.stack([x.ravel() + 1.0 / WIDTH, y.ravel(), np.ones(x.size)], axis=-1)
+    out, holes = emb.splatPixels(pixels.ravel(), target, WIDTH, HEIGHT)
+    out = out.reshape(HEIGHT, WIDTH, 4)
+    np.testing.assert_array_equal(out[:, 1:], pixels[:, :-1])
+    assert holes.reshape(HEIGHT, WIDTH)[:, 0].all() and holes.sum() == HEIGHT
+
+    # the nearest pixel wins where two land on the same spot
+    target[:, 0] = 0.5 / WIDTH
+    target[:, 2] = np.arange(x.size, 0, -1)
+    out, holes = emb.splatPixels(pixels.ravel(), target, WIDTH, HEIGHT)
+    np.testing.assert_array_equal(out.reshape(HEIGHT, WIDTH, 4)[:, 0], pixels[:, -1])
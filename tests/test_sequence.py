@@ -0,0 +1,197 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from conftest import bpy, emb, fake_bpy, readPNG
+
+
+def test_parse_frames():
+    assert emb.parseFrames("1-4,7,10-14:2") == [1, 2, 3, 4, 7, 10, 12, 14]
+    assert emb.parseFrames("-2--1, 3") == [-2, -1, 3]
+    for text in ("", "a-3", "1-4:0", "1-"):
+        with pytest.raises(ValueError):
+            emb.parseFrames(text)
+
+
+def test_pool_renders_shared_times_once(scene):
+    pool = emb.mbSubframePool(size=4)
+    pool.plan(1, [0.0, 0.5])
+    # frame 2 opens where frame 1 is halfway
+    pool.plan(2, [-0.5, 0.0])
+    assert pool.shared() == 1
+
+    first = pool.render(1, 0.5).copy()
+    renders = scene.renders
+    again = pool.render(2, -0.5)
+    assert scene.renders == renders and pool.hits == 1
+    np.testing.assert_array_equal(again, first)
+    # nothing else needs it
+    assert pool.buffers == {} and pool.nbytes == 0
+
+
+def test_pool_is_not_planned_for_paths_without_it(scene):
+    budgets = {1 : 4, 2 : 4}
+    scene.eeveeMotionBlur_vars.shared_subframes = 8
+    scene.eevee.motion_blur_shutter = 2.0
+    assert emb.getSubframePool(bpy.context, [1, 2], budgets, 2.0).shared() > 0
+    for name in ('use_progressive', 'use_motion_tiers', 'use_raw_capture'):
+        setattr(scene.eeveeMotionBlur_vars, name, True)
+        assert emb.getSubframePool(bpy.context, [1, 2], budgets, 2.0).shared() == 0
+        setattr(scene.eeveeMotionBlur_vars, name, False)
+
+
+def renderSequence(scene):
+    renders = scene.renders
+    assert emb.renderMB_sequence(scene.frame_start, scene.frame_end, bpy.context)
+    return (scene.renders - renders)
+
+
+def test_sequence_with_cache_and_async_save(scene):
+    emb_vars = scene.eeveeMotionBlur_vars
+    emb_vars.use_subframe_cache = True
+    emb_vars.use_async_save = True
+    scene.frame_end = 2
+    assert renderSequence(scene) == 8
+
+    journal = emb.mbJournal(scene)
+    for frame in (1, 2):
+        assert journal.isDone(frame)
+        assert len(emb.getCachedSubframePaths(scene, frame)) == 4
+
+    # a render with fewer subframes leaves only its own in the cache
+    scene.eevee.motion_blur_samples = 2
+    assert renderSequence(scene) == 4
+    assert len(emb.getCachedSubframePaths(scene, 1)) == 2
+    assert emb.recompositeMBx1fr(1, bpy.context) == 2
+
+
+def test_sequence_resume(scene):
+    scene.eeveeMotionBlur_vars.use_resume = True
+    scene.frame_end = 3
+    assert renderSequence(scene) == 12
+    # everything is on disk
+    assert renderSequence(scene) == 0
+
+    # frame 2 went missing
+    os.remove(emb.getOutputPath(scene, 2))
+    assert renderSequence(scene) == 4
+    assert emb.mbJournal(scene).isDone(2)
+
+
+def test_sequence_composite_once(scene, monkeypatch):
+    """Raw capture: subframes go to scratch EXRs and are read back"""
+    emb_vars = scene.eeveeMotionBlur_vars
+    emb_vars.use_raw_capture = True
+    emb_vars.use_async_save = True
+    scene.use_nodes = False
+    scene.render.use_compositing = True
+    scene.render.frame_path = lambda frame: scene.render.filepath + "%04d.exr" % frame
+    width, height = scene.render.resolution_x, scene.render.resolution_y
+    rendered = {}
+
+    def render(write_still=False, **kwargs):
+        assert write_still and scene.render.image_settings.file_format == 'OPEN_EXR'
+        scene.renders += 1
+        path = scene.render.frame_path(scene.frame_current)
+        rendered[path] = np.full(width * height * 4, 0.1 * scene.renders, dtype=np.float32)
+        open(path, 'w').close()
+
+    def load(path):
+        image = bpy.data.images.new(os.path.basename(path), width, height)
+        image.pixels.data[...] = rendered.pop(path)
+        return (image)
+
+    monkeypatch.setattr(bpy.ops.render, 'render', render)
+    monkeypatch.setattr(bpy.data.images, 'load', load, raising=False)
+    assert renderSequence(scene) == 4
+    assert emb.mbJournal(scene).isDone(1)
+    # the average of 0.1, 0.2, 0.3 and 0.4
+    header, rows = readPNG(emb.getOutputPath(scene, 1))
+    assert (rows == int(0.25 ** emb_vars.gamma * 255 + 0.5)).all()
+    # scratch files are cleaned up, the settings restored
+    assert glob.glob(os.path.join(emb_vars.scratch_dir, "emb_subframes_*")) == []
+    assert scene.render.image_settings.file_format == 'PNG'
+
+
+def test_progressive_budgets_match_the_render(scene):
+    scene.eeveeMotionBlur_vars.use_progressive = True
+    # no maximum still renders the two subframes the noise needs
+    scene.eeveeMotionBlur_vars.max_samples = 0
+    scene.frame_end = 2
+    assert emb.getFrameBudgets(bpy.context, [1, 2], 0.5) == {1 : 2, 2 : 2}
+    assert renderSequence(scene) == 4
+
+
+def test_checkpoints_create_the_output_folder(scene, tmp_path):
+    # no journal makes the folder for single frames and workers
+    scene.eeveeMotionBlur_vars.checkpoint_interval = 1
+    scene.render.filepath = str(tmp_path / "fresh" / "out_")
+    assert emb.renderFrames(bpy.context, [1, 2]) == 0
+
+
+def test_rolling_shutter_renders_full_frames(scene, monkeypatch):
+    saved = []
+    monkeypatch.setattr(emb, 'saveMBFrame', lambda scene, frame, pixels, *args, **kwargs: saved.append(pixels.copy()))
+    emb_vars = scene.eeveeMotionBlur_vars
+    emb_vars.use_regions = True
+    emb_vars.use_subframe_cache = True
+    emb_vars.rolling_shutter = 0.3
+    # big enough for the motion to show
+    scene.render.resolution_x, scene.render.resolution_y = 160, 80
+    bpy.data.images.new('Viewer Node', 160, 80)
+    # nothing moves, the region is empty
+    scene.objects = [fake_bpy.Object("Still", (0.0, 0.0, 0.0), 0.0)]
+    emb.renderMBx1fr(1, 0.5, 4, bpy.context)
+    # every row has the subframes of its own exposure
+    assert (saved[-1] > 0).all()
+
+    # rendered in regions, the cache can't be read with a rolling shutter
+    emb_vars.rolling_shutter = 0.0
+    scene.objects = [fake_bpy.Object("Moving", (0.0, 0.0, 0.0), 1.0)]
+    emb.renderMBx1fr(1, 0.5, 4, bpy.context)
+    assert any(region is not None for subfr, pixels, region in emb.readCachedSubframes(scene, 1))
+    emb_vars.rolling_shutter = 0.3
+    assert emb.recompositeMBx1fr(1, bpy.context) == 0
+
+
+def test_fast_tiers_render_only_their_region(scene, monkeypatch):
+    emb_vars = scene.eeveeMotionBlur_vars
+    emb_vars.use_motion_tiers = True
+    emb_vars.tier_samples = 2
+    scene.render.resolution_x, scene.render.resolution_y = 160, 80
+    bpy.data.images.new('Viewer Node', 160, 80)
+    scene.objects = [fake_bpy.Object("Fast", (0.0, 0.0, 0.0), 4.0, radius=0.1), 
+        fake_bpy.Object("Still", (3.0, 0.0, 0.0), 0.0)]
+    borders = []
+    render = bpy.ops.render.render
+    def spy(**kwargs):
+        borders.append(scene.render.use_border)
+        render(**kwargs)
+    monkeypatch.setattr(bpy.ops.render, 'render', spy)
+
+    (slow, background, whole), (fast, samples, region) = emb.getMotionTiers(bpy.context, 1, 0.5)
+    assert fast == {"Fast"} and whole is None and region is not None
+    info = {}
+    emb.renderMBx1fr(1, 0.5, 4, bpy.context, info=info)
+    assert borders == [False] * background + [True] * samples
+    assert not scene.render.use_border
+
+    # as big as the frame, rendering it apart costs more than it saves
+    scene.objects = [fake_bpy.Object("Fast", (0.0, 0.0, 0.0), 4.0, radius=5.0)]
+    assert emb.getMotionTiers(bpy.context, 1, 0.5) is None
+
+
+@pytest.mark.parametrize("size, percentage, preset", [((1920, 1080), 50, 'PREVIEW_FAST'), 
+    ((1998, 1080), 100, 'PREVIEW_FAST'), ((1920, 1080), 33, 'PREVIEW_HIGH')])
+def test_preview_sizes_match_the_render(scene, monkeypatch, size, percentage, preset):
+    saved = []
+    monkeypatch.setattr(emb, 'saveMBFrame', lambda scene, frame, pixels, *args, **kwargs: saved.append(pixels.shape))
+    scene.render.resolution_x, scene.render.resolution_y = size
+    scene.render.resolution_percentage = percentage
+    scene.eeveeMotionBlur_vars.quality_preset = preset
+    info = {}
+    assert emb.renderMBx1fr(1, 0.5, 4, bpy.context, info=info) is not False
+    # blender floors the scaled size
+    assert saved == [(size[0] * percentage // 100 * (size[1] * percentage // 100) * 4,)]